@@ -0,0 +1,129 @@
+import json
+import pandas as pd
+from botocore.exceptions import ClientError
+from .aws_s3 import s3, bucket_name, normalize, OPTIMISTIC_RETRIES, ConflictError, conflict_backoff, put_conditional
+from .ledger import read_datasets, list_events, event_seq, claim_state, decided
+
+# Resumen financiero materializado por club/temporada. Lo escribe la ingesta
+# (main.py) y se actualiza de forma incremental plegando los eventos del ledger
+# posteriores a `ledger_seq`, así /api/transfers/revenue no necesita descargar ni
+# parsear los CSV. Las escrituras son condicionales (If-Match) y se reintentan.
+
+AGGREGATE_FIELDS = ("total_spent", "total_income", "altas_count", "bajas_count", "squad_value", "squad_size")
+
+
+def aggregates_key(club, season):
+    return f"datasets/{club}/{season}/{club}_{season}_summary.json".lower()
+
+
+def amount_total(df, column="amount"):
+    if df is None or column not in df.columns:
+        return 0.0
+    return float(pd.to_numeric(df[column], errors="coerce").fillna(0).sum())
+
+
+def transfer_aggregates(df_altas, df_bajas):
+    return {
+        "total_spent": amount_total(df_altas),
+        "total_income": amount_total(df_bajas),
+        "altas_count": 0 if df_altas is None else int(len(df_altas)),
+        "bajas_count": 0 if df_bajas is None else int(len(df_bajas)),
+    }
+
+
+def squad_aggregates(df_players):
+    return {
+        "squad_value": amount_total(df_players, "valor"),
+        "squad_size": 0 if df_players is None else int(len(df_players)),
+    }
+
+
+def _read_versioned(club, season):
+    try:
+        obj = s3.get_object(Bucket=bucket_name, Key=aggregates_key(club, season))
+        return json.loads(obj["Body"].read()), obj.get("ETag")
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None, None
+        raise
+
+
+def _conditional_update(club, season, mutate):
+    key = aggregates_key(club, season)
+    for attempt in range(OPTIMISTIC_RETRIES):
+        record, etag = _read_versioned(club, season)
+        updated = mutate(record)
+        if updated is record:
+            return record
+        try:
+            put_conditional(key, json.dumps(updated).encode("utf-8"), if_match=etag, content_type="application/json")
+            return updated
+        except ConflictError:
+            conflict_backoff(attempt)
+    raise ConflictError(key)
+
+
+def empty_aggregates():
+    return {**{field: 0 for field in AGGREGATE_FIELDS}, "ledger_seq": 0}
+
+
+def rebuild_aggregates(club, season):
+    events = decided(list_events(club, season, fresh=True))
+    return _conditional_update(club, season, lambda record: compute_aggregates(club, season, events) or record)
+
+
+def event_deltas(event, club):
+    if event.get("type") == "revert":
+        return {field: -delta for field, delta in event_deltas(event["event"], club).items()}
+
+    amount = pd.to_numeric(event.get("amount"), errors="coerce")
+    amount = 0.0 if pd.isna(amount) else float(amount)
+    value = pd.to_numeric((event.get("player_row") or {}).get("valor"), errors="coerce")
+    value = 0.0 if pd.isna(value) else float(value)
+
+    deltas = {}
+    if normalize(event.get("from_club")) == normalize(club):
+        deltas.update(total_income=amount, bajas_count=1, squad_value=-value, squad_size=-1)
+    if normalize(event.get("to_club")) == normalize(club):
+        for field, delta in dict(total_spent=amount, altas_count=1, squad_value=value, squad_size=1).items():
+            deltas[field] = deltas.get(field, 0) + delta
+    return deltas
+
+
+def compute_aggregates(club, season, events=None):
+    df_altas, df_bajas, df_players = read_datasets(club, season, "altas", "bajas", "players", events=events)
+    if df_altas is None and df_bajas is None and df_players is None:
+        return None
+    last_seq = event_seq(events[-1][0]) if events else 0
+    return {**transfer_aggregates(df_altas, df_bajas), **squad_aggregates(df_players), "ledger_seq": last_seq}
+
+
+def sync_aggregates(club, season, fresh=False):
+    # La marca ledger_seq no avanza sobre un movimiento que todavía no se sabe si vale.
+    events = decided(list_events(club, season, fresh=fresh))
+
+    def fold(record):
+        if record is None:
+            # Datasets previos a los resúmenes: se calculan una vez y quedan guardados.
+            return compute_aggregates(club, season, events) or record
+        applied = record.get("ledger_seq", 0)
+        pending = [(key, event) for key, event in events if event_seq(key) > applied]
+        if not pending:
+            return record
+        if event_seq(pending[0][0]) != applied + 1:
+            # Faltan eventos que ya fueron compactados: se recalcula desde los datasets.
+            return compute_aggregates(club, season, events) or record
+        updated = dict(record)
+        for _, event in pending:
+            if not claim_state(event):
+                continue
+            for field, delta in event_deltas(event, club).items():
+                updated[field] = updated.get(field, 0) + delta
+        updated["ledger_seq"] = event_seq(pending[-1][0])
+        return updated
+
+    return _conditional_update(club, season, fold) or empty_aggregates()
+
+
+def get_aggregates(club, season):
+    return sync_aggregates(club, season)
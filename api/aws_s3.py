@@ -1,15 +1,31 @@
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
 import pandas as pd
 from dotenv import load_dotenv
 import os
+import hashlib
 import io
+import random
+import threading
+import time
 import unicodedata
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from .dataset_cache import DataFrameCache
+from .dataset_format import parquet_enabled, parquet_key, read_bytes, read_csv_bytes, to_parquet_bytes
+from .response_cache import bump_data_version
 load_dotenv()
 
 aws_ak = os.getenv("AWS_ACCESS_KEY_ID") 
 aws_secret = os.getenv("AWS_SECRET_ACCESS_KEY") 
 bucket_name = os.getenv("BUCKET_NAME")
 region = os.getenv("AWS_REGION")
+S3_MAX_WORKERS = int(os.getenv("S3_MAX_WORKERS", "16"))
+OPTIMISTIC_RETRIES = int(os.getenv("OPTIMISTIC_RETRIES", "8"))
+# En modo parquet, cuánto se recuerda que un dataset todavía no tiene .parquet
+# (sin migrar) antes de volver a probar esa key.
+PARQUET_MISSING_TTL_SECONDS = float(os.getenv("PARQUET_MISSING_TTL_SECONDS", "60"))
 
 def normalize(text):
     if pd.isna(text) or text is None:
@@ -26,111 +42,348 @@ s3 = boto3.client(
     's3',
     aws_access_key_id=aws_ak,
     aws_secret_access_key=aws_secret,
-    region_name=region 
+    region_name=region,
+    config=Config(max_pool_connections=S3_MAX_WORKERS)
 )
 
-def read_aws_csv(path):
+# Pool dedicado a las llamadas bloqueantes de boto3/pandas, para no frenar el event loop.
+s3_executor = ThreadPoolExecutor(max_workers=S3_MAX_WORKERS, thread_name_prefix="s3")
+# Pool separado para escrituras en paralelo: una tarea de s3_executor nunca espera a otra del mismo pool.
+write_executor = ThreadPoolExecutor(max_workers=S3_MAX_WORKERS, thread_name_prefix="s3-write")
+
+# Los DataFrames devueltos se comparten entre requests: no modificarlos in-place.
+dataset_cache = DataFrameCache()
+
+def _is_not_modified(error):
+    code = str(error.response.get("Error", {}).get("Code", ""))
+    status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return code in ("304", "NotModified") or status == 304
+
+def _is_missing(error):
+    code = str(error.response.get("Error", {}).get("Code", ""))
+    status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return code in ("NoSuchKey", "404") or status == 404
+
+def _is_conflict(error):
+    code = str(error.response.get("Error", {}).get("Code", ""))
+    status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return code in ("PreconditionFailed", "ConditionalRequestConflict", "412", "409") or status in (409, 412)
+
+class ConflictError(Exception):
+    pass
+
+def conflict_backoff(attempt):
+    time.sleep(random.uniform(0, 0.02 * (2 ** min(attempt, 5))))
+
+def put_conditional(key, body, if_match=None, metadata=None, content_type=None):
+    # Escritura optimista: con if_match exige que el objeto siga en esa versión (ETag);
+    # sin if_match exige que la key todavía no exista.
+    kwargs = {"Bucket": bucket_name, "Key": key, "Body": body}
+    if if_match:
+        kwargs["IfMatch"] = if_match
+    else:
+        kwargs["IfNoneMatch"] = "*"
+    if metadata:
+        kwargs["Metadata"] = metadata
+    if content_type:
+        kwargs["ContentType"] = content_type
+    try:
+        return s3.put_object(**kwargs)
+    except ClientError as e:
+        if _is_conflict(e):
+            raise ConflictError(key) from e
+        raise
+
+def _read_object(key, columns=None):
+    cache_key = key if columns is None else f"{key}#{','.join(columns)}"
+    entry, stale = dataset_cache.lookup(cache_key)
+    if entry is not None and not stale:
+        dataset_cache.record_hit(cache_key)
+        return entry.df
+
+    if entry is not None:
+        try:
+            obj = s3.get_object(Bucket=bucket_name, Key=key, IfNoneMatch=entry.etag)
+        except ClientError as e:
+            if _is_not_modified(e):
+                dataset_cache.record_hit(cache_key, revalidated=True)
+                return entry.df
+            raise
+    else:
+        obj = s3.get_object(Bucket=bucket_name, Key=key)
+
+    df = read_bytes(key, obj['Body'].read(), columns)
+    df = df.where(pd.notnull(df), None)
+    # Versión del snapshot y último evento del ledger ya incluido en él.
+    df.attrs["key"] = key
+    df.attrs["etag"] = obj.get("ETag")
+    df.attrs["ledger_seq"] = int(obj.get("Metadata", {}).get("ledger-seq", 0))
+    dataset_cache.store(cache_key, df, obj.get("ETag"))
+    return df
+
+_missing_parquet = {}
+_missing_lock = threading.Lock()
+
+def _parquet_missing(key):
+    with _missing_lock:
+        since = _missing_parquet.get(key)
+        if since is not None and (time.monotonic() - since) >= PARQUET_MISSING_TTL_SECONDS:
+            del _missing_parquet[key]
+            since = None
+    return since is not None
+
+def read_aws_csv(path, columns=None):
+    key = path.lower()
+    if columns is not None:
+        columns = list(columns)
     try:
-        obj = s3.get_object(Bucket=bucket_name, Key=path.lower())
-        df = pd.read_csv(io.BytesIO(obj['Body'].read()))
-        return df.where(pd.notnull(df), None) 
+        # Un dataset sin migrar no paga un GET fallido al .parquet en cada lectura.
+        if parquet_enabled() and not _parquet_missing(key):
+            try:
+                return _read_object(parquet_key(key), columns)
+            except ClientError as e:
+                if not _is_missing(e):
+                    raise
+                with _missing_lock:
+                    _missing_parquet[key] = time.monotonic()
+        return _read_object(key, columns)
     except Exception as e:
+        dataset_cache.invalidate(key, parquet_key(key))
         print(f"Error al leer {path}: {e}")
         return None
-    
 
 
-def upload_file(df, s3_path):
-    csv_buffer = io.StringIO()
+
+
+def serialize_dataset(df, s3_path):
+    if parquet_enabled():
+        return parquet_key(s3_path), to_parquet_bytes(df)
+    csv_buffer = io.BytesIO()
     df_clean = df.where(pd.notnull(df), None)
     df_clean.to_csv(csv_buffer, index=False, encoding="utf-8-sig")
+    return s3_path, csv_buffer.getvalue()
+
+def invalidate_dataset(s3_path):
+    dataset_cache.invalidate(s3_path, s3_path.lower(), parquet_key(s3_path), parquet_key(s3_path.lower()))
+    with _missing_lock:
+        _missing_parquet.pop(s3_path.lower(), None)
+
+# Contadores de upload_file para el reporte de cada corrida (ver main.run_all).
+upload_stats = {"written": 0, "skipped": 0, "failed": 0}
+_upload_stats_lock = threading.Lock()
+
+def _count_upload(result):
+    with _upload_stats_lock:
+        upload_stats[result] += 1
+    return result
+
+def reset_upload_stats():
+    with _upload_stats_lock:
+        for key in upload_stats:
+            upload_stats[key] = 0
+
+def _stored_object(key):
+    """Metadata y ETag del objeto en S3, o (None, None) si no existe."""
+    try:
+        head = s3.head_object(Bucket=bucket_name, Key=key)
+    except ClientError as e:
+        if _is_missing(e):
+            return None, None
+        raise
+    return head.get("Metadata", {}), head.get("ETag")
+
+def upload_file(df, s3_path):
+    """Sube el dataset salvo que S3 ya tenga exactamente el mismo contenido.
+    Devuelve "written", "skipped" o "failed"."""
+    target_key, body = serialize_dataset(df, s3_path)
+    digest = hashlib.sha256(body).hexdigest()
     
     try:
-        s3.put_object(
-            Bucket=bucket_name, 
-            Key=s3_path, 
-            Body=csv_buffer.getvalue()
-        )
-        print(f"✅ Subido exitosamente a S3: {s3_path}")
+        for attempt in range(OPTIMISTIC_RETRIES):
+            stored, etag = _stored_object(target_key)
+            if stored is not None and stored.get("content-sha256") == digest:
+                # Mismo contenido: no se reescribe, no se invalida el cache ni cambia el ETag.
+                print(f"⏭️ Sin cambios, se omite: {target_key}")
+                return _count_upload("skipped")
+            if stored is None and target_key != s3_path:
+                # Primera escritura en parquet de un dataset que hasta ahora era CSV.
+                stored = _stored_object(s3_path)[0]
+            # Un scrape nuevo reemplaza el snapshot, pero los movimientos del ledger
+            # que todavía no se compactaron se siguen aplicando encima: se conserva la
+            # marca (ledger-seq) del snapshot reemplazado. La escritura es condicional
+            # para no pisar una compactación que haya movido esa marca mientras tanto.
+            metadata = {"content-sha256": digest}
+            if stored and stored.get("ledger-seq"):
+                metadata["ledger-seq"] = stored["ledger-seq"]
+            try:
+                put_conditional(target_key, body, if_match=etag, metadata=metadata)
+                break
+            except ConflictError:
+                conflict_backoff(attempt)
+        else:
+            raise ConflictError(target_key)
+        invalidate_dataset(s3_path)
+        print(f"✅ Subido exitosamente a S3: {target_key}")
+        return _count_upload("written")
     except Exception as e:
         print(f"❌ Error al subir a S3: {e}")
+        return _count_upload("failed")
+
+def upload_many(items):
+    # items: [(df, s3_path), ...] subidos en paralelo.
+    return list(write_executor.map(lambda item: upload_file(*item), items))
+
+def migrate_csv_to_parquet(prefix="datasets/"):
+    paginator = s3.get_paginator("list_objects_v2")
+    objects = {}
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            objects[obj["Key"]] = (obj["LastModified"], obj.get("ETag"))
+
+    migrated = 0
+    for key, (last_modified, _) in objects.items():
+        if not key.endswith(".csv"):
+            continue
+        target = parquet_key(key)
+        if target in objects and objects[target][0] >= last_modified:
+            continue
+        try:
+            obj = s3.get_object(Bucket=bucket_name, Key=key)
+            body = to_parquet_bytes(read_csv_bytes(obj['Body'].read()))
+            # El parquet incluye los mismos eventos del ledger que el CSV del que sale.
+            metadata = {"content-sha256": hashlib.sha256(body).hexdigest()}
+            if obj.get("Metadata", {}).get("ledger-seq"):
+                metadata["ledger-seq"] = obj["Metadata"]["ledger-seq"]
+            put_conditional(target, body, if_match=objects[target][1] if target in objects else None, metadata=metadata)
+            invalidate_dataset(key)
+            migrated += 1
+            print(f"✅ Migrado: {key} -> {target}")
+        except ConflictError:
+            print(f"⏭️ {target} cambió durante la migración, se omite.")
+        except Exception as e:
+            print(f"❌ Error migrando {key}: {e}")
+    return migrated
 
 def execute_s3_transfer(player_name, season, from_club, to_club, transfer_amount):
-    path_origin_squad = f"datasets/{from_club}/{season}/{from_club}_{season}_players.csv"
-    path_dest_squad = f"datasets/{to_club}/{season}/{to_club}_{season}_players.csv"
-    path_origin_transfers = f"datasets/{from_club}/{season}/{from_club}_{season}_bajas.csv"
-    path_dest_transfers = f"datasets/{to_club}/{season}/{to_club}_{season}_altas.csv"
-    path_origin_vals = f"datasets/{from_club}/{season}/{from_club}_{season}_valuations.csv"
-    path_dest_vals = f"datasets/{to_club}/{season}/{to_club}_{season}_valuations.csv"
-
-    df_origin = read_aws_csv(path_origin_squad)
-    df_dest = read_aws_csv(path_dest_squad)
-    df_trans_origin = read_aws_csv(path_origin_transfers)
-    df_trans_dest = read_aws_csv(path_dest_transfers)
-    df_vals_origin = read_aws_csv(path_origin_vals)
-    df_vals_dest = read_aws_csv(path_dest_vals)
+    # Control de concurrencia optimista: se reclama el siguiente slot del ledger del
+    # club de origen con una escritura condicional. Si otro movimiento lo tomó antes,
+    # se relee el plantel (que ya refleja ese movimiento) y se reintenta. Clubes
+    # distintos no compiten entre sí.
+    for attempt in range(OPTIMISTIC_RETRIES):
+        try:
+            return _try_transfer(player_name, season, from_club, to_club, transfer_amount)
+        except ConflictError:
+            conflict_backoff(attempt)
+        except Exception as e:
+            return f"❌ Error en persistencia: {e}"
+    return "❌ Error: demasiados movimientos simultáneos sobre el mismo club, intentá de nuevo."
+
+def _touches(event, player_id):
+    if event.get("type") == "revert":
+        return _touches(event["event"], player_id)
+    return str(event.get("player_id")).replace('.0', '') == str(player_id).replace('.0', '')
+
+
+def _try_transfer(player_name, season, from_club, to_club, transfer_amount):
+    from .name_index import get_name_index
+    from .aggregates import sync_aggregates
+    from .ledger import list_events, next_seq, event_seq, ledger_prefix, read_datasets, read_dataset, append_event, event_at, maybe_compact, records, LEDGER_COMPACT_GRACE_SECONDS
+    from .squad_value import latest_valuations
+
+    listed_at = time.time()
+    origin_events = list_events(from_club, season, fresh=True)
+    df_origin, df_vals_origin = read_datasets(from_club, season, "players", "valuations", events=origin_events)
+    df_dest = read_dataset(to_club, season, "players")
 
     if df_origin is None or df_dest is None:
         return "❌ Error: No se encontraron los planteles base en S3."
 
-    nombre_buscado = normalize(player_name.lower())
     col_name_squad = next((c for c in df_origin.columns if c.lower().strip() in ['nombre y apellido', 'player_name', 'nombre']), None)
     
     if not col_name_squad:
         return "❌ Error: No se encontró columna de nombre en el plantel."
 
-    mask_squad = df_origin[col_name_squad].str.lower().apply(normalize) == nombre_buscado
-    player_row = df_origin[mask_squad]
+    player_row = df_origin.iloc[get_name_index(df_origin, col_name_squad).find_exact(player_name)]
     
     if player_row.empty:
         return f"⚠️ Jugador '{player_name}' no encontrado en {from_club}."
 
     p_id = player_row.iloc[0].get('player_id') or player_row.iloc[0].get('id')
-    
-    df_vals_origin_upd = df_vals_origin
-    df_vals_dest_upd = df_vals_dest
 
-    if df_vals_origin is not None and p_id is not None:
+    player_vals_rows = pd.DataFrame()
+    if df_vals_origin is not None and p_id is not None and 'player_id' in df_vals_origin.columns:
         mask_vals = df_vals_origin['player_id'].astype(str).str.replace('.0', '', regex=False) == str(p_id).replace('.0', '')
         player_vals_rows = df_vals_origin[mask_vals].copy()
-        
-        if not player_vals_rows.empty:
-            df_vals_origin_upd = df_vals_origin[~mask_vals]
-            player_vals_rows['club'] = to_club.strip().title()
-            
-            if df_vals_dest is not None:
-                df_vals_dest_upd = pd.concat([df_vals_dest, player_vals_rows], ignore_index=True)
-            else:
-                df_vals_dest_upd = player_vals_rows
-
-    df_origin_updated = df_origin[~mask_squad]
-    player_row_updated = player_row.copy()
+        player_vals_rows['club'] = to_club.strip().title()
+
+    player_row_updated = player_row.head(1).copy()
     player_row_updated['club'] = to_club.strip().title()
-    df_dest_updated = pd.concat([df_dest, player_row_updated], ignore_index=True)
 
-    new_transfer = pd.DataFrame([{
+    # Última valoración del jugador: alimenta la tabla latest_valuations de ambos
+    # clubes y el delta de valor del plantel que deja el movimiento.
+    latest = records(latest_valuations(player_vals_rows, player_row))
+    market_value = latest[0]["valuation_amount"] if latest else pd.to_numeric(player_row.iloc[0].get('valor'), errors='coerce')
+
+    event = {
+        "type": "transfer",
+        "transfer_id": uuid.uuid4().hex,
         "player_id": p_id,
         "player_name": player_name.strip().title(),
         "from_club": from_club.strip().title(),
         "to_club": to_club.strip().title(),
         "amount": transfer_amount,
-        "transfer_date": pd.Timestamp.now().strftime('%Y-%m-%d')
-    }])
+        "transfer_date": pd.Timestamp.now().strftime('%Y-%m-%d'),
+        "player_row": records(player_row_updated)[0],
+        "valuation_rows": records(player_vals_rows),
+        "latest_valuation": latest[0] if latest else None,
+        "market_value": None if pd.isna(market_value) else float(market_value),
+    }
 
-    df_bajas_upd = pd.concat([df_trans_origin, new_transfer], ignore_index=True) if df_trans_origin is not None else new_transfer
-    df_altas_upd = pd.concat([df_trans_dest, new_transfer], ignore_index=True) if df_trans_dest is not None else new_transfer
+    # El movimiento queda confirmado por el reclamo de un slot en el ledger del club de
+    # origen, que se escribe último: el evento del destino lleva el transfer_id y los
+    # lectores no lo aplican hasta que el origen tiene un evento con ese id. Si el
+    # proceso muere entre las dos escrituras, o el reclamo no llega a tiempo, el evento
+    # del destino queda sin efecto y el jugador sigue en el origen.
+    written_at = time.time()
+    dest_key = append_event(to_club, season, {**event, "origin_ledger": ledger_prefix(from_club, season)})
+    claim = {**event, "dest_key": dest_key}
+    deadline = written_at + LEDGER_COMPACT_GRACE_SECONDS / 2
+    for attempt in range(OPTIMISTIC_RETRIES):
+        seq = next_seq(origin_events)
+        try:
+            append_event(from_club, season, claim, seq, listed_at=listed_at)
+            break
+        except Exception as e:
+            # Un error de red puede esconder un reclamo que sí llegó: decide el slot.
+            if (event_at(from_club, season, seq) or {}).get("transfer_id") == event["transfer_id"]:
+                break
+            if not isinstance(e, ConflictError):
+                raise
+            conflict_backoff(attempt)
+        # Otro movimiento tomó el slot. Si no tocó a este jugador el evento sigue
+        # siendo válido y se reclama el siguiente; si lo tocó, se arma todo de nuevo
+        # (el evento del destino que quedó escrito nunca va a valer).
+        last = event_seq(origin_events[-1][0]) if origin_events else 0
+        listed_at = time.time()
+        origin_events = list_events(from_club, season, fresh=True)
+        newer = [e for key, e in origin_events if event_seq(key) > last]
+        if (listed_at > deadline or (origin_events and event_seq(origin_events[0][0]) > last + 1)
+                or any(_touches(e, p_id) for e in newer)):
+            raise ConflictError(from_club)
+    else:
+        raise ConflictError(from_club)
 
-    try:
-        upload_file(df_origin_updated, path_origin_squad)
-        upload_file(df_dest_updated, path_dest_squad)
-        upload_file(df_bajas_upd, path_origin_transfers)
-        upload_file(df_altas_upd, path_dest_transfers)
+    # El cache de respuestas, los resúmenes y la compactación se pueden recuperar más
+    # tarde: no invalidan el movimiento.
+    for club in (from_club, to_club):
+        try:
+            bump_data_version(club, season)
+        except Exception as e:
+            print(f"⚠️ No se pudo invalidar el cache de respuestas de {club} {season}: {e}")
+        try:
+            sync_aggregates(club, season, fresh=True)
+        except Exception as e:
+            print(f"⚠️ No se pudo actualizar el resumen de {club} {season}: {e}")
+        maybe_compact(club, season)
         
-        if df_vals_origin_upd is not None:
-            upload_file(df_vals_origin_upd, path_origin_vals)
-        if df_vals_dest_upd is not None:
-            upload_file(df_vals_dest_upd, path_dest_vals)
-            
-        return f"✅ EXITOSO: {player_name} transferido a {to_club}."
-    except Exception as e:
-        return f"❌ Error en persistencia: {e}"
\ No newline at end of file
+    return f"✅ EXITOSO: {player_name} transferido a {to_club}."
\ No newline at end of file
@@ -0,0 +1,113 @@
+import atexit
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+# Pool de navegadores headless reutilizables. Levantar Chrome es lo más caro de
+# get_salaries: las sesiones se crean bajo demanda hasta `size`, se reutilizan
+# entre llamadas (y entre hilos del orquestador), se chequean antes de cada uso
+# y se reciclan después de `max_uses` páginas o ante cualquier error.
+
+BROWSER_POOL_SIZE = int(os.getenv("SALARIES_BROWSERS", "2"))
+BROWSER_MAX_USES = int(os.getenv("SALARIES_BROWSER_MAX_USES", "50"))
+
+
+class PooledBrowser:
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+
+
+class BrowserPool:
+    def __init__(self, factory, size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._all = set()
+        self.created = 0
+        self.recycled = 0
+
+    def _healthy(self, browser):
+        try:
+            return browser.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _discard(self, browser):
+        with self._lock:
+            self._all.discard(browser)
+            self.recycled += 1
+        try:
+            browser.driver.quit()
+        except Exception:
+            pass
+
+    def _take(self):
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._healthy(browser):
+                return browser
+            self._discard(browser)
+        browser = PooledBrowser(self.factory())
+        with self._lock:
+            self._all.add(browser)
+            self.created += 1
+        return browser
+
+    @contextmanager
+    def session(self):
+        """Presta un driver; si la página falla, el navegador se descarta en vez de volver al pool."""
+        self._slots.acquire()
+        browser = None
+        try:
+            browser = self._take()
+            yield browser.driver
+            browser.uses += 1
+            if self.max_uses and browser.uses >= self.max_uses:
+                self._discard(browser)
+            else:
+                self._idle.put(browser)
+        except BaseException:
+            if browser is not None:
+                self._discard(browser)
+            raise
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            browsers = list(self._all)
+            self._all.clear()
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for browser in browsers:
+            try:
+                browser.driver.quit()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {"size": self.size, "open": len(self._all), "created": self.created, "recycled": self.recycled}
+
+
+_pools = []
+
+
+def make_pool(factory, **kwargs):
+    pool = BrowserPool(factory, **kwargs)
+    _pools.append(pool)
+    return pool
+
+
+@atexit.register
+def _close_pools():
+    for pool in _pools:
+        pool.close()
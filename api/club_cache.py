@@ -0,0 +1,59 @@
+import os
+import time
+from pathlib import Path
+from sqlite_store import SQLiteStore
+
+# Cache persistente club_id -> nombre para get_valuations. Vive en SQLite (modo WAL)
+# para sobrevivir entre corridas y compartirse entre los procesos de un scraping
+# en paralelo (ver api/sqlite_store.py); las escrituras son upserts.
+
+CLUB_CACHE_PATH = os.getenv("CLUB_CACHE_PATH", str(Path(__file__).resolve().parent.parent / ".cache" / "club_names.sqlite"))
+CLUB_CACHE_TTL_SECONDS = float(os.getenv("CLUB_CACHE_TTL_DAYS", "30")) * 24 * 3600
+
+_store = SQLiteStore(
+    CLUB_CACHE_PATH,
+    "CREATE TABLE IF NOT EXISTS clubs (club_id TEXT PRIMARY KEY, name TEXT NOT NULL, fetched_at REAL NOT NULL)",
+)
+
+
+def get_many(club_ids):
+    """Devuelve {club_id: nombre} solo para los ids cacheados y no vencidos."""
+    ids = list({str(club_id) for club_id in club_ids})
+    if not ids:
+        return {}
+    cutoff = time.time() - CLUB_CACHE_TTL_SECONDS
+    return dict(_store.query_in("SELECT club_id, name FROM clubs WHERE fetched_at >= ? AND club_id IN ({})", ids, [cutoff]))
+
+
+def get(club_id):
+    return get_many([club_id]).get(str(club_id))
+
+
+def put_many(pairs, overwrite=True):
+    """Guarda pares (club_id, nombre). Con overwrite=False no pisa entradas existentes."""
+    rows = [(str(club_id), name, time.time()) for club_id, name in pairs if name]
+    if not rows:
+        return 0
+    if overwrite:
+        sql = ("INSERT INTO clubs (club_id, name, fetched_at) VALUES (?, ?, ?) "
+               "ON CONFLICT(club_id) DO UPDATE SET name = excluded.name, fetched_at = excluded.fetched_at")
+    else:
+        sql = "INSERT OR IGNORE INTO clubs (club_id, name, fetched_at) VALUES (?, ?, ?)"
+    with _store.transaction() as conn:
+        conn.executemany(sql, rows)
+    return len(rows)
+
+
+def put(club_id, name):
+    put_many([(club_id, name)])
+
+
+def seed_from_valuations(df):
+    """Carga los pares club_id/club_nombre de un dataset de valoraciones ya guardado."""
+    if df is None or "club_id" not in df.columns or "club_nombre" not in df.columns:
+        return 0
+    pairs = df[["club_id", "club_nombre"]].dropna().drop_duplicates("club_id")
+    # Los nombres de fallback no son nombres reales: no se cachean.
+    pairs = pairs[~pairs["club_nombre"].astype(str).str.match(r"^(Club \d+|Sin Club / Desconocido)$")]
+    ids = pairs["club_id"].astype(str).str.replace(".0", "", regex=False)
+    return put_many(zip(ids, pairs["club_nombre"]), overwrite=False)
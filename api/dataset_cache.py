@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Cache en memoria de DataFrames ya parseados, indexado por key de S3.
+# Se revalida contra S3 con ETag (If-None-Match) y se desaloja por LRU y por tamaño.
+
+CACHE_MAX_ENTRIES = int(os.getenv("DATASET_CACHE_MAX_ENTRIES", "64"))
+CACHE_MAX_BYTES = int(os.getenv("DATASET_CACHE_MAX_MB", "256")) * 1024 * 1024
+CACHE_REVALIDATE_SECONDS = float(os.getenv("DATASET_CACHE_REVALIDATE_SECONDS", "5"))
+
+
+def frame_size(df):
+    try:
+        return int(df.memory_usage(index=True, deep=True).sum())
+    except Exception:
+        return 0
+
+
+class CacheEntry:
+    def __init__(self, df, etag, size):
+        self.df = df
+        self.etag = etag
+        self.size = size
+        self.validated_at = time.monotonic()
+        self.derived = {}
+
+
+class DataFrameCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, revalidate_seconds=CACHE_REVALIDATE_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def lookup(self, key):
+        """Devuelve (entry, necesita_revalidar) o (None, True) si no está cacheado."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, True
+            self._entries.move_to_end(key)
+            fresh = (time.monotonic() - entry.validated_at) < self.revalidate_seconds
+            return entry, not fresh
+
+    def record_hit(self, key, revalidated=False):
+        with self._lock:
+            self.hits += 1
+            if revalidated:
+                self.revalidations += 1
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.validated_at = time.monotonic()
+
+    def store(self, key, df, etag):
+        size = frame_size(df)
+        with self._lock:
+            self.misses += 1
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = CacheEntry(df, etag, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def memo(self, key, token, build):
+        """Cachea un DataFrame calculado localmente mientras `token` no cambie (sin revalidar contra S3)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.etag == token:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.df
+        df = build()
+        if df is not None:
+            self.store(key, df, token)
+        return df
+
+    def derived(self, df, name, build):
+        """Memoiza estructuras derivadas (ej. índices) del DataFrame cacheado `df`."""
+        with self._lock:
+            entry = self._entry_for(df)
+            if entry is not None and name in entry.derived:
+                return entry.derived[name]
+        value = build()
+        with self._lock:
+            entry = self._entry_for(df)
+            if entry is not None:
+                entry.derived[name] = value
+        return value
+
+    def invalidate(self, *keys):
+        with self._lock:
+            # También descarta las proyecciones por columnas ("key#col1,col2").
+            for key in keys:
+                projected = [k for k in self._entries if k.startswith(f"{key}#")]
+                for k in [key, *projected]:
+                    if self._remove(k):
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _entry_for(self, df):
+        for entry in self._entries.values():
+            if entry.df is df:
+                return entry
+        return None
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry.size
+        return True
@@ -0,0 +1,68 @@
+import io
+import os
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# "csv" (por defecto) o "parquet". En modo parquet se escribe Parquet tipado y
+# la lectura prueba primero la key .parquet y, si no existe, cae al CSV original.
+DATASET_FORMAT = os.getenv("DATASET_FORMAT", "csv").strip().lower()
+
+if DATASET_FORMAT == "parquet" and pa is None:
+    print("⚠️ DATASET_FORMAT=parquet pero pyarrow no está instalado; se usa CSV.")
+    DATASET_FORMAT = "csv"
+
+
+def parquet_enabled():
+    return DATASET_FORMAT == "parquet"
+
+
+def parquet_key(key):
+    return key[:-4] + ".parquet" if key.endswith(".csv") else key
+
+
+def prepare_for_parquet(df):
+    # Columnas object con tipos mezclados (ej. amount con ints y "Libre / Cesión")
+    # se guardan como texto, igual que quedarían después de un round-trip por CSV.
+    df = df.where(pd.notnull(df), None)
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].map(lambda v: None if v is None else str(v))
+    return df
+
+
+def to_parquet_bytes(df):
+    buffer = io.BytesIO()
+    table = pa.Table.from_pandas(prepare_for_parquet(df), preserve_index=False)
+    pq.write_table(table, buffer, compression="zstd")
+    return buffer.getvalue()
+
+
+def read_parquet_bytes(data, columns=None):
+    source = pa.BufferReader(data)
+    if columns is not None:
+        available = set(pq.read_schema(source).names)
+        columns = [c for c in columns if c in available]
+    return pq.read_table(source, columns=columns).to_pandas()
+
+
+def read_csv_bytes(data, columns=None):
+    if columns is None:
+        return pd.read_csv(io.BytesIO(data), encoding="utf-8-sig")
+    wanted = set(columns)
+    return pd.read_csv(io.BytesIO(data), encoding="utf-8-sig", usecols=lambda c: c in wanted)
+
+
+def read_bytes(key, data, columns=None):
+    if key.endswith(".parquet"):
+        return read_parquet_bytes(data, columns)
+    return read_csv_bytes(data, columns)
@@ -1,7 +1,8 @@
 import requests
-from bs4 import BeautifulSoup
+from html_parsing import parse_items_tables
+from http_cache import fetch, season_max_age
 
-def get_players(url: str):
+def get_players(url: str, season: str = None, only_if_changed: bool = False):
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
     }
@@ -10,14 +11,18 @@ def get_players(url: str):
     session.headers.update(headers)
     
     try:
-        response = session.get(url)
+        response = fetch(url, session, max_age=season_max_age(season))
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
         print(f"Error en la petición: {e}")
         return []
 
+    if only_if_changed and not response.changed:
+        # La página no cambió desde la última descarga: no hace falta parsear ni subir nada.
+        return None
+
     if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = parse_items_tables(response.text)
         players = []
         
         items_table = soup.find('table', class_='items')
@@ -46,23 +51,12 @@ def get_players(url: str):
                 all_inline_tds = inline_table.find_all('td') if inline_table else []
                 posicion = all_inline_tds[-1].get_text(strip=True) if all_inline_tds else "N/A"
                 tds_zentriert = item.find_all('td', class_='zentriert')
+                # Valor, nacimiento y altura se guardan como texto: parsers.parse_players
+                # los convierte por columna.
                 td_valor = item.find('td', class_='rechts hauptlink')
-                valor_num = 0  
-                if td_valor and td_valor.find('a'):
-                    raw_v = td_valor.find('a').get_text(strip=True).replace('€', '').replace(',', '.')
-                    if 'mill' in raw_v:
-                        val_str = raw_v.replace('mill.', '').replace('mill', '').strip()
-                        valor_num = int(float(val_str) * 1000000)
-                    elif 'mil' in raw_v:
-                        val_str = raw_v.replace('mil.', '').replace('mil', '').strip()
-                        valor_num = int(float(val_str) * 1000)
-                fecha, edad = "N/A", "N/A"
-                if len(tds_zentriert) > 1:
-                    nacimiento_raw = tds_zentriert[1].get_text(strip=True)
-                    if " (" in nacimiento_raw:
-                        partes = nacimiento_raw.split(" (")
-                        fecha = partes[0]
-                        edad = partes[1].replace(")", "")
+                valor_link = td_valor.find('a') if td_valor else None
+                valor_raw = valor_link.get_text(strip=True) if valor_link else ""
+                nacimiento_raw = tds_zentriert[1].get_text(strip=True) if len(tds_zentriert) > 1 else "N/A"
                 
                 club_anterior = "N/A"  
                 if len(tds_zentriert) > 7:
@@ -72,18 +66,6 @@ def get_players(url: str):
                 pie = tds_zentriert[4].get_text(strip=True) if len(tds_zentriert) > 5 else "N/A"
                 
                 altura_raw = tds_zentriert[3].get_text(strip=True) if len(tds_zentriert) > 3 else "N/A"
-                        
-                if altura_raw in ["indeterminado", "indeterminadom", "N/A"]:
-                            altura_limpia = 0.0
-                elif 'm' in altura_raw:
-                    altura_limpia = altura_raw.replace('m', '').replace(',', '.').strip()
-                    try:
-                        altura_limpia = int(float(altura_limpia) * 100)
-                    except ValueError:
-                        altura_limpia = 0.0
-                else: 
-                    altura_limpia = altura_raw
-
 
                 nacionalidad = "N/A"
                 if len(tds_zentriert) > 2:
@@ -96,12 +78,12 @@ def get_players(url: str):
                     "número": numero, 
                     "nombre y apellido": nombre, 
                     "posicion": posicion, 
-                    "edad": edad, 
-                    "fecha de nacimiento": fecha, 
+                    "edad": None, 
+                    "fecha de nacimiento": nacimiento_raw, 
                     "pie": pie,
                     "pais de orígen": nacionalidad,
-                    "altura": altura_limpia,
-                    "valor": valor_num,
+                    "altura": altura_raw,
+                    "valor": valor_raw,
                     "club anterior": club_anterior
                 })
                 
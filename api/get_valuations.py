@@ -3,6 +3,16 @@ import time
 from bs4 import BeautifulSoup
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from rate_limit import throttle
+from http_cache import fetch
+import club_cache as club_store
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+VALUATIONS_WORKERS = int(os.getenv("VALUATIONS_WORKERS", "8"))
+# Configurables para poder apuntar a un servidor local (ver bench/scrapers.py).
+TMAPI_URL = os.getenv("TMAPI_URL", "https://tmapi-alpha.transfermarkt.technology")
+TRANSFERMARKT_ES_URL = os.getenv("TRANSFERMARKT_ES_URL", "https://www.transfermarkt.es")
 
 club_cache = {}
 
@@ -13,7 +23,8 @@ def get_session():
         backoff_factor=2, 
         status_forcelist=[429, 500, 502, 503, 504], 
     )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+    # Un pool por worker para que los hilos no esperen conexiones libres.
+    adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=VALUATIONS_WORKERS, pool_maxsize=VALUATIONS_WORKERS)
     session.mount("https://", adapter)
     session.mount("http://", adapter)
     
@@ -34,8 +45,14 @@ def get_club_name_by_id(club_id):
     if club_id_str in club_cache:
         return club_cache[club_id_str]
 
+    stored = club_store.get(club_id_str)
+    if stored:
+        club_cache[club_id_str] = stored
+        return stored
+
     try:
-        url = f"https://www.transfermarkt.es/codigoz/startseite/verein/{club_id_str}"
+        url = f"{TRANSFERMARKT_ES_URL}/codigoz/startseite/verein/{club_id_str}"
+        throttle(url)
         response = session.get(url, timeout=15)
         
         if response.status_code == 200:
@@ -45,6 +62,7 @@ def get_club_name_by_id(club_id):
             if h1_name:
                 name = h1_name.get_text(strip=True)
                 club_cache[club_id_str] = name
+                club_store.put(club_id_str, name)
                 return name
                 
     except Exception as e:
@@ -52,10 +70,10 @@ def get_club_name_by_id(club_id):
             
     return f"Club {club_id}"
 
-def get_valuations(player_id, player_name):
-    url = f"https://tmapi-alpha.transfermarkt.technology/player/{player_id}/market-value-history"
+def fetch_history(player_id, max_age=0):
+    url = f"{TMAPI_URL}/player/{player_id}/market-value-history"
     try:
-        response = session.get(url, timeout=10)
+        response = fetch(url, session, max_age=max_age, timeout=10)
         if response.status_code != 200:
             return []
         
@@ -63,44 +81,61 @@ def get_valuations(player_id, player_name):
         if not data.get('success') or 'data' not in data or 'history' not in data['data']:
             return []
             
-        history_raw = data['data']['history']
-        valuations_parsed = []
-        
-        for entry in history_raw:
-            c_id = entry.get('clubId')
-            
-            c_nombre = get_club_name_by_id(c_id)
-            
-            valuations_parsed.append({
-                "player_id": player_id,
-                "nombre_jugador": player_name, 
-                "valuation_amount": entry['marketValue']['value'], 
-                "valuation_date": entry['marketValue']['determined'],
-                "age_at_valuation": entry['age'],
-                "club_id": c_id,
-                "club_nombre": c_nombre
-            })
-            
-        return valuations_parsed
+        return data['data']['history']
 
     except Exception as e: 
         print(f"Error fetching valuations for player {player_id}: {e}")
         return []
 
-def get_all_team_valuations(players_list):
-    all_history = []
+def parse_history(player_id, player_name, history_raw, club_names):
+    valuations_parsed = []
+    
+    for entry in history_raw:
+        c_id = entry.get('clubId')
+        
+        valuations_parsed.append({
+            "player_id": player_id,
+            "nombre_jugador": player_name, 
+            "valuation_amount": entry['marketValue']['value'], 
+            "valuation_date": entry['marketValue']['determined'],
+            "age_at_valuation": entry['age'],
+            "club_id": c_id,
+            "club_nombre": club_names[c_id]
+        })
+        
+    return valuations_parsed
+
+def get_valuations(player_id, player_name):
+    history_raw = fetch_history(player_id)
+    club_names = {c_id: get_club_name_by_id(c_id) for c_id in {entry.get('clubId') for entry in history_raw}}
+    return parse_history(player_id, player_name, history_raw, club_names)
+
+def get_all_team_valuations(players_list, max_workers=VALUATIONS_WORKERS, max_age=0):
     print(f"Iniciando extracción de valoraciones para {len(players_list)} jugadores...")
     start_time = time.time()
-    
+
+    players = {}
     for player in players_list:
         p_id = player.get("player_id")
-        p_name = player.get("nombre y apellido")
-        
-        if p_id and p_id != "N/A":
-            historial_jugador = get_valuations(p_id, p_name)
-            all_history.extend(historial_jugador)
-            time.sleep(0.3) 
+        if p_id and p_id != "N/A" and p_id not in players:
+            players[p_id] = player.get("nombre y apellido")
+
+    # 1. Historiales en paralelo (el ritmo por host lo pone el token bucket).
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        histories = dict(zip(players, executor.map(lambda p_id: fetch_history(p_id, max_age), players)))
+
+        # 2. Los clubes de todo el plantel se resuelven una sola vez cada uno.
+        #    Primero se consulta el cache persistente en bloque; solo se descargan los que faltan.
+        club_ids = list({entry.get('clubId') for history in histories.values() for entry in history})
+        stored = club_store.get_many(c_id for c_id in club_ids if c_id)
+        missing = [c_id for c_id in club_ids if str(c_id) not in stored]
+        club_names = {c_id: stored[str(c_id)] for c_id in club_ids if str(c_id) in stored}
+        club_names.update(zip(missing, executor.map(get_club_name_by_id, missing)))
+
+    all_history = []
+    for p_id, p_name in players.items():
+        all_history.extend(parse_history(p_id, p_name, histories[p_id], club_names))
     
     end_time = time.time()
-    print(f"Finalizado en {round(end_time - start_time, 2)} segundos.")
-    return all_history
\ No newline at end of file
+    print(f"Finalizado en {round(end_time - start_time, 2)} segundos ({len(club_ids)} clubes distintos, {len(missing)} fuera del cache).")
+    return all_history
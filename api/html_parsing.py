@@ -0,0 +1,49 @@
+import pandas as pd
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Parseo de las páginas de transfermarkt (tablas "items") y capology (tabla de
+# sueldos) limitado a esas tablas: el resto de la página (menús, scripts,
+# publicidad) ni siquiera se construye como árbol.
+# Usa lxml si está instalado y cae a html.parser si no.
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+ITEMS_TABLES = SoupStrainer("table", class_="items")
+SALARIES_TABLE = SoupStrainer("table", id="table")
+
+
+def parse_items_tables(html):
+    return BeautifulSoup(html, HTML_PARSER, parse_only=ITEMS_TABLES)
+
+
+def parse_salaries(html):
+    """Tabla de sueldos de capology. Devuelve None si la página no trae la tabla cargada."""
+    table = BeautifulSoup(html, HTML_PARSER, parse_only=SALARIES_TABLE).find('table', id='table')
+    if not table or not table.find('thead') or not table.find('tbody'):
+        return None
+
+    header_row = table.find('thead').find_all('tr')[-1]
+    headers = [th.get_text(strip=True) for th in header_row.find_all('th')]
+
+    try:
+        target_col_index = next(i for i, h in enumerate(headers) if "Gross P/Y" in h)
+    except StopIteration:
+        print("❌ No se encontró la columna de sueldo anual.")
+        return pd.DataFrame()
+
+    rows = table.find('tbody').find_all('tr')
+    players_data = []
+
+    for row in rows:
+        cols = row.find_all('td')
+        if len(cols) > target_col_index:
+            players_data.append({
+                "nombre": cols[0].get_text(strip=True),
+                "sueldo_anual": cols[target_col_index].get_text(strip=True).replace('£', '').replace(',', '').replace(' ', ''),
+            })
+
+    return pd.DataFrame(players_data) if players_data else None
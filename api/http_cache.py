@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+import requests
+from rate_limit import throttle
+
+# Cache HTTP en disco para los scrapers. Cada URL guarda el cuerpo y sus
+# validadores (ETag / Last-Modified): si la copia es más nueva que el max_age
+# de su temporada no se toca la red; si no, se revalida con un GET condicional.
+# `changed` indica si el contenido difiere del último que el pipeline marcó
+# como procesado (mark_processed, recién después de subir lo que salió de la
+# página), así puede saltear el parseo y la subida de páginas que no cambiaron
+# sin perder una corrida que falló a mitad de camino.
+
+HTTP_CACHE_DIR = Path(os.getenv("HTTP_CACHE_DIR", str(Path(__file__).resolve().parent.parent / ".cache" / "http")))
+# Temporada en curso: siempre se revalida (0) salvo que se configure otra cosa.
+CURRENT_SEASON_MAX_AGE = float(os.getenv("HTTP_CACHE_CURRENT_MAX_AGE_SECONDS", "0"))
+PAST_SEASON_MAX_AGE = float(os.getenv("HTTP_CACHE_PAST_MAX_AGE_DAYS", "30")) * 24 * 3600
+
+
+class CachedResponse:
+    def __init__(self, url, status_code, content, encoding, changed, from_cache):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding or "utf-8"
+        self.changed = changed
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} para {self.url}")
+
+
+def current_season(today=None):
+    # Las temporadas de transfermarkt empiezan en julio: "2025" es la 2025/26.
+    today = today or date.today()
+    return today.year if today.month >= 7 else today.year - 1
+
+
+def season_max_age(season):
+    try:
+        past = int(season) < current_season()
+    except (TypeError, ValueError):
+        return CURRENT_SEASON_MAX_AGE
+    return PAST_SEASON_MAX_AGE if past else CURRENT_SEASON_MAX_AGE
+
+
+def _paths(url):
+    digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    folder = HTTP_CACHE_DIR / digest[:2]
+    return folder / f"{digest}.json", folder / f"{digest}.body"
+
+
+def _load(url):
+    meta_path, body_path = _paths(url)
+    try:
+        meta = json.loads(meta_path.read_text())
+        return meta, body_path.read_bytes()
+    except (OSError, ValueError):
+        return None, None
+
+
+def _write_atomic(path, data):
+    # Escritura a un temporal + rename: otro proceso nunca lee un archivo a medias. El
+    # temporal es único por escritura: dos hilos pueden guardar la misma URL a la vez.
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _store(url, meta, body=None):
+    meta_path, body_path = _paths(url)
+    meta_path.parent.mkdir(parents=True, exist_ok=True)
+    if body is not None:
+        _write_atomic(body_path, body)
+    _write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+
+
+def _processed(meta):
+    # Entradas anteriores a mark_processed: la última descarga se daba por procesada.
+    return meta.get("processed", meta.get("sha256")) if meta is not None else None
+
+
+def mark_processed(url):
+    """Marca la última descarga de `url` como procesada: hasta que la página cambie,
+    fetch() la devuelve con changed=False."""
+    meta, _ = _load(url)
+    if meta is not None and meta.get("sha256"):
+        _store(url, {**meta, "processed": meta["sha256"]})
+
+
+def fetch(url, session=None, max_age=0, **kwargs):
+    """GET con cache en disco. Los errores de red se propagan igual que con requests."""
+    meta, body = _load(url)
+    if meta is not None and time.time() - meta["fetched_at"] < max_age:
+        changed = meta.get("sha256") != _processed(meta)
+        return CachedResponse(url, meta["status_code"], body, meta.get("encoding"), changed=changed, from_cache=True)
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    if meta is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    throttle(url)
+    response = (session or requests).get(url, headers=headers, **kwargs)
+
+    if response.status_code == 304 and meta is not None:
+        _store(url, {**meta, "fetched_at": time.time()})
+        changed = meta.get("sha256") != _processed(meta)
+        return CachedResponse(url, meta["status_code"], body, meta.get("encoding"), changed=changed, from_cache=True)
+
+    content = response.content
+    digest = hashlib.sha256(content).hexdigest()
+    if response.status_code == 200:
+        _store(url, {
+            "status_code": response.status_code,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "encoding": response.encoding,
+            "sha256": digest,
+            "processed": _processed(meta),
+            "fetched_at": time.time(),
+        }, content)
+    changed = digest != _processed(meta)
+    return CachedResponse(url, response.status_code, content, response.encoding, changed=changed, from_cache=False)
@@ -1,11 +1,16 @@
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, BackgroundTasks, Request
+import asyncio
 import sys
-import pandas as pd
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-import unicodedata
 from pathlib import Path
-from .aws_s3 import read_aws_csv, execute_s3_transfer
+from .aws_s3 import execute_s3_transfer, dataset_cache
+from .ledger import read_dataset, read_dataset_async, read_datasets_async
+from .name_index import get_name_index
+from .aggregates import get_aggregates
+from .squad_value import get_squad_value
+from .json_response import json_response, records_json, records_response
+from .response_cache import cached_response, stats as response_cache_stats
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_PATH = BASE_DIR / "datasets"
@@ -74,58 +79,39 @@ class SimulateTransferRequest(BaseModel):
     to_club: str
     transfer_amount: int
 
-# --- UTILIDADES ---
-
-def normalize(text):
-    if pd.isna(text) or text is None:
-        return ""
-    text_str = str(text)
-    text_nfkd = unicodedata.normalize("NFD", text_str)
-    without_accents = "".join(c for c in text_nfkd if unicodedata.category(c) != "Mn")
-    return without_accents.lower().strip()
-
 # --- ENDPOINTS ---
 @app.get("/api/squad/{club}/{season}")
-async def get_squad(club: str, season: str):
-    df = read_aws_csv(f"datasets/{club}/{season}/{club}_{season}_players.csv")
-    df_clean = df.astype(object).replace({pd.NA: None, float('nan'): None})
-    
-    return {
-        "status": "success",
-        "source": "cache",
-        "data": df_clean.to_dict(orient="records")
-    }
+async def get_squad(club: str, season: str, request: Request):
+    df = await read_dataset_async(club, season, "players")
+    return json_response([b'{"status":"success","source":"cache","data":', records_json(df), b"}"], request)
 
 
 
+@app.get("/api/squad/{club}/{season}/value")
+async def squad_value(club: str, season: str):
+    value = await asyncio.to_thread(get_squad_value, club, season)
+    if value is None:
+        return {
+            "status": "error",
+            "message": f"No hay valoraciones para {club} en la temporada {season}"
+        }
+    return {"status": "success", "data": value}
+
+
 @app.post("/api/transfers")
-def get_transfers(data: TransfersData):
-    # 1. Intentamos leer los archivos de S3
-    df_altas = read_aws_csv(f"datasets/{data.club}/{data.season}/{data.club}_{data.season}_altas.csv")
-    df_bajas = read_aws_csv(f"datasets/{data.club}/{data.season}/{data.club}_{data.season}_bajas.csv")
-
-    # 2. Función de limpieza robusta
-    def sanitize_data(df):
-        if df is None or df.empty:
-            return []
-        # Reemplazamos NaN específicamente por None, que JSON traduce a null
-        # Usamos object para que acepte el None sin problemas de tipos
-        return df.astype(object).where(pd.notnull(df), None).to_dict(orient="records")
-
-    # 3. Retornamos la estructura original sanitizada
-    return {
-        "altas": sanitize_data(df_altas),
-        "bajas": sanitize_data(df_bajas),
-    }
+async def get_transfers(data: TransfersData, request: Request):
+    # 1. Intentamos leer los archivos de S3 (en paralelo)
+    df_altas, df_bajas = await read_datasets_async(data.club, data.season, "altas", "bajas")
+
+    # 2. Serializamos cada tabla en una sola pasada (NaN -> null)
+    return json_response([b'{"altas":', records_json(df_altas), b',"bajas":', records_json(df_bajas), b"}"], request)
 
 
 @app.post("/api/transfers/revenue")
 def revenue(data: RevenueRequest):
-    df_altas = read_aws_csv(f"datasets/{data.club}/{data.season}/{data.club}_{data.season}_altas.csv")
-    df_bajas = read_aws_csv(f"datasets/{data.club}/{data.season}/{data.club}_{data.season}_bajas.csv")
-
-    total_spent = pd.to_numeric(df_altas["amount"], errors="coerce").fillna(0).sum()
-    total_income = pd.to_numeric(df_bajas["amount"], errors="coerce").fillna(0).sum()
+    summary = get_aggregates(data.club, data.season)
+    total_spent = summary["total_spent"]
+    total_income = summary["total_income"]
 
     net_benefit = float(total_income - total_spent)
     budget_remaining = float(data.transfer_budget - total_spent + total_income)
@@ -139,18 +125,15 @@ def revenue(data: RevenueRequest):
 
 
 @app.post("/api/valuations")
-def get_player_valuation(data: PlayerValuationRequest):
-    df_valuation = read_aws_csv(f"datasets/{data.club}/{data.season}/{data.club}_{data.season}_valuations.csv")
-    player_query = normalize(data.player)
-
-    def row_match(row):
-        player_name_norm = normalize(str(row.get("nombre_jugador", "")))
-        return player_query in player_name_norm
+def get_player_valuation(data: PlayerValuationRequest, request: Request):
+    df_valuation = read_dataset(
+        data.club, data.season, "valuations",
+        columns=["nombre_jugador", "valuation_amount", "valuation_date"],
+    )
+    names = get_name_index(df_valuation, "nombre_jugador")
+    result = df_valuation.iloc[names.find_substring(data.player)][["valuation_amount", "valuation_date"]]
 
-    mask = df_valuation.apply(row_match, axis=1)
-    result = df_valuation.loc[mask, ["valuation_amount", "valuation_date"]]
-
-    return result.to_dict(orient="records")
+    return records_response(result, request)
 
 
 
@@ -162,18 +145,18 @@ async def ingest_club_data(club: str, season: str, background_tasks: BackgroundT
 
 @app.post("/api/summary/{club}/{season}")
 async def generate_summary(club: str, season: str):
-    res = get_season_summary(club, season)
+    res = await asyncio.to_thread(cached_response, "summary", club, season, lambda: get_season_summary(club, season))
     return res
 
 @app.post("/api/simulateTransfer")
 async def simulate_transfer(data: SimulateTransferRequest):
-    res = execute_s3_transfer(data.player, data.season, data.from_club, data.to_club,  data.transfer_amount)
+    res = await asyncio.to_thread(execute_s3_transfer, data.player, data.season, data.from_club, data.to_club, data.transfer_amount)
     return res
 
 
 @app.post("/api/playerInfo")
 async def get_player_info(data: PlayerRequest):
-    df = read_aws_csv(f"datasets/{data.club}/{data.season}/{data.club}_{data.season}_players.csv")
+    df = await read_dataset_async(data.club, data.season, "players")
 
     if df is None:
         return {
@@ -181,9 +164,8 @@ async def get_player_info(data: PlayerRequest):
             "message": f"No se pudo cargar la base de datos para {data.club} en la temporada {data.season}"
         }
 
-    search_name = normalize(data.name)
-    
-    filtered_data = df[df["nombre y apellido"].apply(lambda x: search_name in normalize(str(x)) if x else False)]
+    names = get_name_index(df, "nombre y apellido")
+    filtered_data = df.iloc[names.find_substring(data.name)]
 
     if filtered_data.empty:
         return {"message": "Jugador no encontrado", "buscado": data.name, "status": "error"}
@@ -195,7 +177,11 @@ async def get_player_info(data: PlayerRequest):
         "data": clean_data
     }
 
+@app.get("/api/cache/stats")
+def cache_stats():
+    return {**dataset_cache.stats(), "responses": response_cache_stats()}
+
 @app.post("/api/squadAnalysis")
 def squad_analysis(data: TransfersData):
-    analysis = get_squad_analysis(data.club, data.season)
+    analysis = cached_response("squadAnalysis", data.club, data.season, lambda: get_squad_analysis(data.club, data.season))
     return analysis
\ No newline at end of file
@@ -0,0 +1,61 @@
+import os
+import zlib
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from .aws_s3 import dataset_cache
+
+# Respuestas JSON para tablas grandes (plantel, altas/bajas, valuaciones).
+# El encoder en C de pandas serializa directo desde las columnas y convierte
+# NaN/NA en null en la misma pasada, sin copias astype(object) ni to_dict.
+# El JSON de cada DataFrame cacheado se memoiza, así un mismo dataset se
+# serializa una sola vez mientras siga en el cache.
+
+GZIP_MIN_BYTES = int(os.getenv("JSON_GZIP_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("JSON_GZIP_LEVEL", "5"))
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def records_json(df):
+    """Devuelve la tabla como bytes de un array JSON de registros."""
+    if df is None or df.empty:
+        return b"[]"
+    return dataset_cache.derived(df, "json:records", lambda: _encode(df))
+
+
+def _encode(df):
+    return df.to_json(orient="records", force_ascii=False, date_format="iso").encode("utf-8")
+
+
+def _accepts_gzip(request):
+    return request is not None and "gzip" in request.headers.get("accept-encoding", "").lower()
+
+
+def _gzip_stream(parts):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for part in parts:
+        view = memoryview(part)
+        for start in range(0, len(view), STREAM_CHUNK_BYTES):
+            chunk = compressor.compress(view[start:start + STREAM_CHUNK_BYTES])
+            if chunk:
+                yield chunk
+    yield compressor.flush()
+
+
+def json_response(parts, request=None):
+    """Arma la respuesta a partir de fragmentos JSON ya serializados.
+
+    Si el cliente acepta gzip y el cuerpo supera JSON_GZIP_MIN_BYTES se envía
+    comprimido en streaming, sin armar el cuerpo completo en memoria.
+    """
+    size = sum(len(part) for part in parts)
+    if GZIP_MIN_BYTES > 0 and size >= GZIP_MIN_BYTES and _accepts_gzip(request):
+        return StreamingResponse(
+            _gzip_stream(parts),
+            media_type="application/json",
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+        )
+    return Response(content=b"".join(parts), media_type="application/json")
+
+
+def records_response(df, request=None):
+    return json_response([records_json(df)], request)
@@ -0,0 +1,420 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import pandas as pd
+from .aws_s3 import (
+    s3, bucket_name, s3_executor, write_executor, dataset_cache, read_aws_csv, normalize,
+    OPTIMISTIC_RETRIES, ConflictError, conflict_backoff, put_conditional, serialize_dataset, invalidate_dataset,
+)
+from .dataset_cache import CACHE_REVALIDATE_SECONDS
+
+# Ledger append-only de transferencias simuladas. Cada movimiento se guarda como un
+# objeto JSON inmutable en datasets/{club}/{season}/ledger/ de ambos clubes; los
+# lectores aplican esos deltas sobre el snapshot base y compact_ledger() los
+# vuelca periódicamente al snapshot.
+#
+# Los eventos se numeran por club/temporada ({seq:010d}.json) y cada slot se escribe
+# con If-None-Match: dos escritores que compiten por el mismo número no pueden
+# pisarse; el perdedor relee el estado y reintenta. Cada snapshot guarda en su
+# metadata (ledger-seq) el último evento que ya incluye.
+#
+# Una transferencia se escribe primero en el ledger del destino, marcada con el
+# ledger del origen (origin_ledger) y un transfer_id, y después reclama un slot en
+# el ledger del origen: ese reclamo es el único punto de confirmación. El evento del
+# destino solo vale si el ledger del origen tiene un evento con el mismo transfer_id;
+# si el proceso muere entre las dos escrituras o el reclamo no llega, queda en el
+# destino sin efecto.
+
+DATASET_KINDS = ("players", "altas", "bajas", "valuations", "latest_valuations")
+# Tablas derivadas que solo se compactan si ya existen (ver squad_value.py).
+DERIVED_KINDS = ("latest_valuations",)
+LEDGER_COMPACT_THRESHOLD = int(os.getenv("LEDGER_COMPACT_THRESHOLD", "50"))
+# Solo se compactan eventos con cierta antigüedad: un "revert" nunca llega después de
+# que su evento original ya fue volcado al snapshot, y el evento del destino de una
+# transferencia se vuelca cuando ya se sabe si su reclamo en el origen llegó.
+LEDGER_COMPACT_GRACE_SECONDS = float(os.getenv("LEDGER_COMPACT_GRACE_SECONDS", "60"))
+
+_event_bodies = {}
+_listings = {}
+# transfer_id -> si el reclamo en el origen quedó confirmado (solo estados definitivos).
+_claims = {}
+# Snapshots (path, ETag) cuyo hueco con el ledger ya se confirmó que no es una compactación en curso.
+_gaps = set()
+_lock = threading.Lock()
+
+
+def dataset_path(club, season, kind):
+    return f"datasets/{club}/{season}/{club}_{season}_{kind}.csv"
+
+
+def ledger_prefix(club, season):
+    return f"datasets/{club}/{season}/ledger/".lower()
+
+
+def event_key(club, season, seq):
+    return f"{ledger_prefix(club, season)}{seq:010d}.json"
+
+
+def _same_id(a, b):
+    return a is not None and b is not None and str(a).replace('.0', '') == str(b).replace('.0', '')
+
+
+def _same_club(a, b):
+    return normalize(a) == normalize(b)
+
+
+def records(df):
+    if df is None or df.empty:
+        return []
+    return df.astype(object).where(pd.notnull(df), None).to_dict(orient="records")
+
+
+def event_seq(key):
+    return int(key.rsplit("/", 1)[-1].split(".", 1)[0])
+
+
+def next_seq(events):
+    return event_seq(events[-1][0]) + 1 if events else 1
+
+
+def _fetch_event(key):
+    with _lock:
+        if key in _event_bodies:
+            return _event_bodies[key]
+    try:
+        event = json.loads(s3.get_object(Bucket=bucket_name, Key=key)["Body"].read())
+    except s3.exceptions.NoSuchKey:
+        # Borrado por una compactación concurrente.
+        return None
+    with _lock:
+        _event_bodies[key] = event
+    return event
+
+
+def _list_keys(prefix):
+    keys = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        keys.extend(obj["Key"] for obj in page.get("Contents", []) if obj["Key"].endswith(".json"))
+    keys.sort()
+    with _lock:
+        _listings[prefix] = (time.monotonic(), keys)
+    return keys
+
+
+def list_events(club, season, fresh=False):
+    return _events(ledger_prefix(club, season), fresh)
+
+
+def _events(prefix, fresh=False):
+    with _lock:
+        listed = _listings.get(prefix)
+    if fresh or listed is None or (time.monotonic() - listed[0]) >= CACHE_REVALIDATE_SECONDS:
+        keys = _list_keys(prefix)
+    else:
+        keys = listed[1]
+    events = [(key, _fetch_event(key)) for key in keys]
+    if any(event is None for _, event in events):
+        events = [(key, _fetch_event(key)) for key in _list_keys(prefix)]
+    return [(key, event) for key, event in events if event is not None]
+
+
+def _remember(prefix, key, event):
+    with _lock:
+        _event_bodies[key] = event
+        listed = _listings.get(prefix)
+        if listed is not None:
+            _listings[prefix] = (listed[0], sorted({*listed[1], key}))
+
+
+def append_event(club, season, event, seq=None, attempts=OPTIMISTIC_RETRIES, listed_at=None):
+    """Escribe el evento en el ledger del club. Con `seq` reclama exactamente ese slot
+    (ConflictError si ya está ocupado); sin él toma el siguiente libre. `listed_at`
+    es el time.time() del listado del que salió `seq`."""
+    prefix = ledger_prefix(club, season)
+    if seq is not None and listed_at is not None and time.time() - listed_at > LEDGER_COMPACT_GRACE_SECONDS / 2:
+        # La compactación borra eventos con más de LEDGER_COMPACT_GRACE_SECONDS: con un
+        # listado tan viejo, `seq` pudo haber sido ocupado y borrado mientras tanto, y
+        # el If-None-Match lo volvería a aceptar por debajo de la marca del snapshot.
+        raise ConflictError(prefix)
+    event = {**event, "committed_at": time.time()}
+    body = json.dumps(event, default=str).encode("utf-8")
+    for attempt in range(1 if seq is not None else attempts):
+        slot = seq if seq is not None else next_seq(list_events(club, season, fresh=True))
+        key = event_key(club, season, slot)
+        try:
+            put_conditional(key, body, content_type="application/json")
+            _remember(prefix, key, event)
+            return key
+        except ConflictError:
+            if seq is not None:
+                raise
+            conflict_backoff(attempt)
+    raise ConflictError(prefix)
+
+
+def event_at(club, season, seq):
+    """El evento del slot `seq` (None si está libre o ya fue compactado)."""
+    return _fetch_event(event_key(club, season, seq))
+
+
+def claim_state(event):
+    """True si el evento vale, False si no vale ni va a valer y None si todavía no se
+    sabe: el evento del destino está escrito pero el reclamo en el origen puede estar
+    en camino (se intenta como mucho LEDGER_COMPACT_GRACE_SECONDS / 2 después)."""
+    origin_ledger = event.get("origin_ledger")
+    if origin_ledger is None:
+        return True
+    transfer_id = event.get("transfer_id")
+    with _lock:
+        if transfer_id in _claims:
+            return _claims[transfer_id]
+    expired = time.time() - event.get("committed_at", 0) > LEDGER_COMPACT_GRACE_SECONDS
+    # Vencido, se decide con un listado fresco: después de eso ya no puede cambiar.
+    if any(claim.get("transfer_id") == transfer_id for _, claim in _events(origin_ledger, fresh=expired)):
+        state = True
+    elif expired:
+        state = False
+    else:
+        return None
+    with _lock:
+        _claims[transfer_id] = state
+    return state
+
+
+def decided(events):
+    """Los eventos hasta el primero cuyo reclamo en el origen todavía no se sabe
+    (excluido). Quien guarda una marca del último evento aplicado (aggregates) no
+    puede pasar por encima de uno que después puede empezar a valer."""
+    for pos, (_, event) in enumerate(events):
+        if claim_state(event) is None:
+            return events[:pos]
+    return events
+
+
+def _transfer_row(event):
+    return {field: event.get(field) for field in ("player_id", "player_name", "from_club", "to_club", "amount", "transfer_date", "market_value")}
+
+
+def _drop_player(frame, player_id):
+    if "player_id" not in frame.columns:
+        return frame
+    return frame[~frame["player_id"].map(lambda v: _same_id(v, player_id))]
+
+
+def _drop_transfer_row(frame, event):
+    if "player_id" not in frame.columns:
+        return frame
+    row = _transfer_row(event)
+    matches = [
+        idx for idx, values in frame.iterrows()
+        if _same_id(values.get("player_id"), row["player_id"])
+        and str(values.get("amount")) == str(row["amount"])
+        and values.get("transfer_date") == row["transfer_date"]
+    ]
+    return frame.drop(index=matches[-1:]) if matches else frame
+
+
+def _apply_transfer(frame, kind, club, event, inverse=False):
+    outgoing = _same_club(event["from_club"], club)
+    incoming = _same_club(event["to_club"], club)
+    added = []
+
+    if not inverse:
+        if kind in ("players", "valuations", "latest_valuations") and outgoing:
+            frame = _drop_player(frame, event["player_id"])
+        if kind == "players" and incoming and event.get("player_row"):
+            added = [event["player_row"]]
+        elif kind == "valuations" and incoming:
+            added = event.get("valuation_rows") or []
+        elif kind == "latest_valuations" and incoming and event.get("latest_valuation"):
+            added = [event["latest_valuation"]]
+        elif (kind == "altas" and incoming) or (kind == "bajas" and outgoing):
+            added = [_transfer_row(event)]
+    else:
+        # Deshace un movimiento que ya estaba volcado en el snapshot.
+        home = event["from_club"]
+        if kind in ("players", "valuations", "latest_valuations") and incoming:
+            frame = _drop_player(frame, event["player_id"])
+        if kind == "players" and outgoing and event.get("player_row"):
+            added = [{**event["player_row"], "club": home}]
+        elif kind == "valuations" and outgoing:
+            added = [{**row, "club": home} for row in event.get("valuation_rows") or []]
+        elif kind == "latest_valuations" and outgoing and event.get("latest_valuation"):
+            added = [event["latest_valuation"]]
+        elif (kind == "altas" and incoming) or (kind == "bajas" and outgoing):
+            frame = _drop_transfer_row(frame, event)
+
+    if added:
+        frame = pd.concat([frame, pd.DataFrame(added)], ignore_index=True)
+    return frame
+
+
+def apply_events(df, kind, club, events):
+    frame = df if df is not None else pd.DataFrame()
+    present = {event_seq(key) for key, _ in events}
+    reverted = {event.get("reverts") for _, event in events if event.get("type") == "revert"}
+    for key, event in events:
+        if event.get("type") == "revert":
+            # Si el original también está pendiente, ambos se ignoran; si ya fue
+            # compactado en el snapshot, se aplica la operación inversa.
+            if event["reverts"] not in present:
+                frame = _apply_transfer(frame, kind, club, event["event"], inverse=True)
+        elif event_seq(key) not in reverted:
+            frame = _apply_transfer(frame, kind, club, event)
+
+    if df is None and frame.empty:
+        return None
+    frame = frame.reset_index(drop=True)
+    return frame.where(pd.notnull(frame), None)
+
+
+def read_dataset(club, season, kind, columns=None, events=None):
+    path = dataset_path(club, season, kind)
+    if events is None:
+        try:
+            events = list_events(club, season)
+        except Exception as e:
+            print(f"Error al leer el ledger de {club} {season}: {e}")
+            events = []
+    if not events:
+        return read_aws_csv(path, columns)
+
+    # Los deltas identifican jugadores por player_id, así que la proyección lo incluye.
+    base_columns = None if columns is None else list(dict.fromkeys([*columns, "player_id"]))
+    # Al releer el ledger no se suman eventos posteriores a los recibidos: quien pasa
+    # `events` registra hasta cuál aplicó (aggregates guarda el último como marca) y
+    # los siguientes se aplicarían dos veces.
+    limit = event_seq(events[-1][0])
+    for attempt in range(OPTIMISTIC_RETRIES):
+        base = read_aws_csv(path, base_columns)
+        watermark = base.attrs.get("ledger_seq", 0) if base is not None else 0
+        version = (path, base.attrs.get("etag") if base is not None else None)
+        pending = [(key, event) for key, event in events if event_seq(key) > watermark]
+        if not pending or event_seq(pending[0][0]) == watermark + 1 or version in _gaps:
+            break
+        # Los eventos que faltan ya fueron compactados en un snapshot más nuevo.
+        invalidate_dataset(path)
+        events = [(key, event) for key, event in list_events(club, season, fresh=True) if event_seq(key) <= limit]
+        conflict_backoff(attempt)
+    else:
+        # Ni releyendo el snapshot ni el ledger se cierra el hueco: el snapshot se
+        # reescribió sin su marca y esos eventos ya no existen (o, sin snapshot, la
+        # compactación no tuvo nada que volcar). Se aplica lo que queda y no se
+        # vuelve a esperar por esta versión del snapshot.
+        if base is not None:
+            print(f"⚠️ {path} no incluye los eventos del ledger anteriores a {event_seq(pending[0][0])}; se aplican los pendientes.")
+        with _lock:
+            _gaps.add(version)
+    # Los eventos de destino sin su reclamo en el origen (todavía o nunca) no se aplican.
+    pending = [(key, event) for key, event in pending if claim_state(event)]
+    if not pending:
+        return base if columns is None or base is None else base[[c for c in columns if c in base.columns]]
+
+    # El resultado mergeado se cachea junto a la key base, mientras no cambien ni
+    # el snapshot (key y ETag: id() se reutiliza entre DataFrames) ni la lista de eventos.
+    snapshot = f"{base.attrs.get('key')}@{base.attrs.get('etag')}" if base is not None else "-"
+    token = f"{snapshot}:{len(pending)}:{pending[-1][0]}"
+    cache_key = f"{path.lower()}#ledger:{','.join(columns or [])}"
+
+    def build():
+        merged = apply_events(base, kind, club, pending)
+        if merged is not None and columns is not None:
+            merged = merged[[c for c in columns if c in merged.columns]]
+        return merged
+
+    return dataset_cache.memo(cache_key, token, build)
+
+
+def read_datasets(club, season, *kinds, events=None):
+    return list(s3_executor.map(lambda kind: read_dataset(club, season, kind, events=events), kinds))
+
+
+async def read_dataset_async(club, season, kind, columns=None):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(s3_executor, lambda: read_dataset(club, season, kind, columns))
+
+
+async def read_datasets_async(club, season, *kinds):
+    return await asyncio.gather(*(read_dataset_async(club, season, kind) for kind in kinds))
+
+
+def compact_ledger(club, season):
+    events = list_events(club, season, fresh=True)
+    cutoff = time.time() - LEDGER_COMPACT_GRACE_SECONDS
+    settled = 0
+    while settled < len(events) and events[settled][1].get("committed_at", 0) <= cutoff:
+        settled += 1
+    events = events[:settled]
+    if len(events) < 2:
+        return 0
+
+    # Cada snapshot se reescribe condicionado a la versión leída (If-Match) y marcado
+    # con el último evento incluido; si otro proceso compactó antes, se aborta.
+    last_seq = event_seq(events[-1][0])
+    writes = []
+    for kind in DATASET_KINDS:
+        path = dataset_path(club, season, kind)
+        base = read_aws_csv(path)
+        if base is not None and base.attrs.get("ledger_seq", 0) >= last_seq:
+            continue
+        if base is None and kind in DERIVED_KINDS:
+            continue
+        merged = read_dataset(club, season, kind, events=events)
+        if merged is None:
+            continue
+        key, body = serialize_dataset(merged, path)
+        # El If-Match tiene que ser de la key que se escribe: en modo parquet el snapshot
+        # leído puede ser todavía el CSV, y ahí el .parquet se crea (If-None-Match).
+        if_match = base.attrs.get("etag") if base is not None and base.attrs.get("key") == key.lower() else None
+        writes.append((path, key, body, if_match))
+
+    def write_snapshot(write):
+        path, key, body, if_match = write
+        try:
+            put_conditional(key, body, if_match=if_match, metadata={"ledger-seq": str(last_seq)})
+        finally:
+            invalidate_dataset(path)
+
+    futures = [write_executor.submit(write_snapshot, write) for write in writes]
+    if any(isinstance(future.exception(), ConflictError) for future in futures):
+        print(f"⚠️ Compactación de {club} {season} cancelada: un snapshot cambió mientras tanto.")
+        return 0
+    for future in futures:
+        future.result()
+
+    # Se conserva el último evento como ancla de la numeración, y los reclamos cuyo
+    # evento en el destino sigue en el ledger: es lo que lo confirma.
+    listings = {}
+    keys = [key for key, event in events[:-1] if not _awaited(event, listings)]
+    for i in range(0, len(keys), 1000):
+        s3.delete_objects(Bucket=bucket_name, Delete={"Objects": [{"Key": key} for key in keys[i:i + 1000]]})
+
+    prefix = ledger_prefix(club, season)
+    with _lock:
+        _listings.pop(prefix, None)
+        for key in keys:
+            _event_bodies.pop(key, None)
+    print(f"🗜️ Ledger de {club} {season} compactado ({len(keys)} eventos).")
+    return len(keys)
+
+
+def _awaited(event, listings):
+    # Listado fresco del ledger del destino (uno por club en cada compactación).
+    dest_key = event.get("dest_key")
+    if dest_key is None:
+        return False
+    prefix = dest_key.rsplit("/", 1)[0] + "/"
+    if prefix not in listings:
+        listings[prefix] = set(_list_keys(prefix))
+    return dest_key in listings[prefix]
+
+
+def maybe_compact(club, season):
+    try:
+        if len(list_events(club, season)) > LEDGER_COMPACT_THRESHOLD:
+            compact_ledger(club, season)
+    except Exception as e:
+        print(f"❌ Error compactando el ledger de {club} {season}: {e}")
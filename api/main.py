@@ -1,69 +1,159 @@
 import json
 import pandas as pd
 from get_teams_players import get_players
-from get_team_transfers import get_team_transfers
+from get_team_transfers import get_team_transfers, transfers_url
 from get_valuations import get_all_team_valuations
 from salaries_scrapper import get_salaries
-from .aws_s3 import upload_file
+from rate_limit import stats as rate_limit_stats
+from club_cache import seed_from_valuations
+from http_cache import season_max_age, mark_processed
+from parsers import parse_players, parse_transfers
+from .aws_s3 import s3, bucket_name, read_aws_csv, upload_file, upload_many, upload_stats, reset_upload_stats
+from .aggregates import rebuild_aggregates
+from .squad_value import latest_valuations
+from .name_matching import fuzzy_merge
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import math 
+import os
 import time 
 
+SCRAPER_WORKERS = int(os.getenv("SCRAPER_WORKERS", "4"))
+
 with open("urls.json", "r") as f:
     urls = json.load(f)
 
+def finish_page(url, results, label):
+    # La página solo queda como procesada si todo lo que salió de ella llegó a S3;
+    # si no, la próxima corrida la vuelve a parsear aunque no haya cambiado.
+    if "failed" in results:
+        print(f"⚠️ {label}: no se pudieron subir todos los datasets, se reintenta en la próxima corrida.")
+    else:
+        mark_processed(url)
+    return "written" in results
+
 def team_data(club: str, temporada: str):
-    players = get_players(urls[club]["players"] + temporada)
+    players_url = urls[club]["players"] + temporada
+    players = get_players(players_url, season=temporada, only_if_changed=True)
+
+    if players is None:
+        print(f"⏭️ Plantel de {club} {temporada} sin cambios, se omite.")
+        return False
 
     if players:
-        df = pd.DataFrame(players)
+        df = parse_players(pd.DataFrame(players))
         
         salarios = get_salaries(club, temporada)
         if not salarios.empty:
             salarios['sueldo_anual'] = pd.to_numeric(salarios['sueldo_anual'], errors='coerce').fillna(0)
-            complete_df = pd.merge(df, salarios, left_on="nombre y apellido", right_on="nombre", how='left')
+            complete_df = fuzzy_merge(df, salarios, "nombre y apellido", "nombre", score_column="sueldo_match_score")
+            sin_match = int(complete_df["sueldo_match_score"].isna().sum())
+            if sin_match:
+                print(f"⚠️ {sin_match} jugadores de {club} {temporada} sin sueldo asociado.")
             complete_df.drop(columns=["nombre"], inplace=True)
             complete_df['sueldo_anual'] = complete_df['sueldo_anual'].fillna(0)
         else:
             df['sueldo_anual'] = 0
             complete_df = df
         
-        upload_file(complete_df, f"datasets/{club}/{temporada}/{club}_{temporada}_players.csv")
+        results = [upload_file(complete_df, f"datasets/{club}/{temporada}/{club}_{temporada}_players.csv")]
                     
         print(f"Datos de jugadores guardados en datasets/{club}/{temporada}/{club}_{temporada}_players.csv")
-        total_valuations = get_all_team_valuations(players) 
+        total_valuations = get_all_team_valuations(players, max_age=season_max_age(temporada))
         clean_valuations = [{k: (v if not (isinstance(v, float) and math.isnan(v)) else 0) for k, v in d.items()}for d in total_valuations]
         df_valuations = pd.DataFrame(clean_valuations)
-        upload_file(df_valuations,f"datasets/{club}/{temporada}/{club}_{temporada}_valuations.csv")
+        results.append(upload_file(df_valuations,f"datasets/{club}/{temporada}/{club}_{temporada}_valuations.csv"))
         print(f"Valoraciones guardadas en datasets/{club}/{temporada}/{club}_{temporada}_valuations.csv")
+        results.append(upload_file(latest_valuations(df_valuations, complete_df), f"datasets/{club}/{temporada}/{club}_{temporada}_latest_valuations.csv"))
+        return finish_page(players_url, results, f"Plantel de {club} {temporada}")
+    return False
 
 def transfer_data(club: str, temporada: str):
-    player_info = get_team_transfers(urls[club]["transfers"], temporada)
+    player_info = get_team_transfers(urls[club]["transfers"], temporada, only_if_changed=True)
+
+    if player_info is None:
+        print(f"⏭️ Transferencias de {club} {temporada} sin cambios, se omiten.")
+        return False
     
 
     if player_info and len(player_info) == 2:
         tabla_altas, tabla_bajas = player_info
-        df_altas = pd.DataFrame(tabla_altas)
-        df_bajas = pd.DataFrame(tabla_bajas)
+        df_altas = parse_transfers(pd.DataFrame(tabla_altas))
+        df_bajas = parse_transfers(pd.DataFrame(tabla_bajas))
         
-        upload_file(df_altas, f"datasets/{club}/{temporada}/{club}_{temporada}_altas.csv")
-        upload_file(df_bajas, f"datasets/{club}/{temporada}/{club}_{temporada}_bajas.csv")
+        results = upload_many([
+            (df_altas, f"datasets/{club}/{temporada}/{club}_{temporada}_altas.csv"),
+            (df_bajas, f"datasets/{club}/{temporada}/{club}_{temporada}_bajas.csv"),
+        ])
         print(f"Transferencias guardadas en datasets/{club}/{temporada}")
+        return finish_page(transfers_url(urls[club]["transfers"], temporada), results, f"Transferencias de {club} {temporada}")
+    return False
+
+def seed_club_cache(prefix="datasets/"):
+    # Los nombres de clubes ya guardados en las valoraciones evitan volver a
+    # descargar sus páginas.
+    paginator = s3.get_paginator("list_objects_v2")
+    keys = [
+        obj["Key"]
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix)
+        for obj in page.get("Contents", [])
+        if obj["Key"].endswith("_valuations.csv") and not obj["Key"].endswith("_latest_valuations.csv")
+    ]
+    seeded = sum(seed_from_valuations(read_aws_csv(key, ["club_id", "club_nombre"])) for key in keys)
+    print(f"✅ Cache de clubes: {seeded} nombres cargados desde {len(keys)} datasets de valoraciones.")
+    return seeded
+
+
+def process_season(club: str, temporada: str):
+    transfers_changed = transfer_data(club, temporada)
+    team_changed = team_data(club, temporada)
+    if transfers_changed or team_changed:
+        rebuild_aggregates(club, temporada)
+
+
+def run_all(clubes, temporadas, workers=SCRAPER_WORKERS):
+    # Cada club/temporada es un job independiente; la cortesía con cada sitio la
+    # ponen los token buckets por host (rate_limit.py), no sleeps entre jobs.
+    jobs = [(club, temporada) for club in clubes for temporada in temporadas]
+    print(f"🏁 {len(jobs)} jobs ({len(clubes)} clubes x {len(temporadas)} temporadas) con {workers} workers")
+    start = time.monotonic()
+    failed = []
+    reset_upload_stats()
+
+    def run(job):
+        job_start = time.monotonic()
+        process_season(*job)
+        return time.monotonic() - job_start
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run, job): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            club, temporada = futures[future]
+            elapsed = time.monotonic() - start
+            try:
+                print(f"✅ [{done}/{len(jobs)}] {club} {temporada} en {future.result():.1f}s "
+                      f"({done / elapsed * 60:.1f} jobs/min)")
+            except Exception as e:
+                failed.append((club, temporada))
+                print(f"❌ [{done}/{len(jobs)}] Error procesando {club} en {temporada}: {e}")
+
+    elapsed = time.monotonic() - start
+    print(f"⏱️ {len(jobs) - len(failed)}/{len(jobs)} jobs en {elapsed:.1f}s ({len(jobs) / elapsed * 60:.1f} jobs/min)")
+    print(f"   S3: {upload_stats['written']} datasets escritos, {upload_stats['skipped']} sin cambios, {upload_stats['failed']} con error")
+    for host, host_stats in rate_limit_stats().items():
+        print(f"   {host}: {host_stats['requests']} requests, {host_stats['waited_seconds']}s en espera")
+    return failed
+
 
 if __name__ == "__main__":
     clubes = list(urls.keys())
     temporadas = ["2020", "2021", "2022", "2023", "2024", "2025"]
-    
-    for club in clubes:
-        print(f"--- Procesando Club: {club.upper()} ---")
-        for temporada in temporadas:
-            try:
-                print(f"Extrayendo datos de {club} - Temporada {temporada}...")
-                transfer_data(club, temporada)
-                team_data(club, temporada)
-                time.sleep(2) 
-                
-            except Exception as e:
-                print(f"❌ Error procesando {club} en {temporada}: {e}")
-                continue 
-    
-    print("✅ Proceso de scraping finalizado para todos los clubes.")
\ No newline at end of file
+
+    try:
+        seed_club_cache()
+    except Exception as e:
+        print(f"⚠️ No se pudo precargar el cache de clubes: {e}")
+
+    failed = run_all(clubes, temporadas)
+    if failed:
+        print(f"⚠️ Fallaron {len(failed)} jobs: {failed}")
+    print("✅ Proceso de scraping finalizado para todos los clubes.")
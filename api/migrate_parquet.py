@@ -0,0 +1,8 @@
+from .aws_s3 import migrate_csv_to_parquet
+
+# Uso (desde la raíz del repo): python -m api.migrate_parquet [prefijo]
+if __name__ == "__main__":
+    import sys
+    prefix = sys.argv[1] if len(sys.argv) > 1 else "datasets/"
+    total = migrate_csv_to_parquet(prefix)
+    print(f"🏁 Migración finalizada: {total} datasets convertidos a Parquet.")
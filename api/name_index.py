@@ -0,0 +1,60 @@
+from bisect import bisect_left
+from collections import defaultdict
+from .aws_s3 import dataset_cache, normalize
+
+# Índice de nombres normalizados por dataset: se construye una sola vez cuando el
+# DataFrame entra al cache y se comparte entre /api/playerInfo, /api/valuations
+# y execute_s3_transfer.
+
+NGRAM_SIZE = 3
+
+
+def _ngrams(text):
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class NameIndex:
+    def __init__(self, names):
+        self.names = [normalize(name) for name in names]
+        self.exact = defaultdict(list)
+        self.grams = defaultdict(set)
+        for pos, name in enumerate(self.names):
+            self.exact[name].append(pos)
+            for gram in _ngrams(name):
+                self.grams[gram].add(pos)
+        self.sorted_names = sorted((name, pos) for pos, name in enumerate(self.names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def find_exact(self, query):
+        return list(self.exact.get(normalize(query), []))
+
+    def find_prefix(self, query):
+        prefix = normalize(query)
+        start = bisect_left(self.sorted_names, (prefix, -1))
+        positions = []
+        for name, pos in self.sorted_names[start:]:
+            if not name.startswith(prefix):
+                break
+            positions.append(pos)
+        return sorted(positions)
+
+    def find_substring(self, query):
+        text = normalize(query)
+        if len(text) < NGRAM_SIZE:
+            return [pos for pos, name in enumerate(self.names) if name and text in name]
+
+        postings = sorted((self.grams.get(gram, set()) for gram in _ngrams(text)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return []
+        return sorted(pos for pos in candidates if text in self.names[pos])
+
+
+def get_name_index(df, column):
+    if df is None or column not in df.columns:
+        return NameIndex([])
+    return dataset_cache.derived(df, f"names:{column}", lambda: NameIndex(df[column].tolist()))
@@ -0,0 +1,143 @@
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+import pandas as pd
+from .aws_s3 import normalize
+
+# Cruce aproximado de nombres entre fuentes (transfermarkt vs capology). En vez
+# de comparar todos contra todos, se indexa el lado derecho por bloques (prefijo
+# de cada token y, si hay, año de nacimiento) y solo se puntúan los candidatos
+# que comparten algún bloque. Acentos, orden de los nombres, iniciales ("J.
+# Álvarez") y abreviaturas ("Vini Jr.") se resuelven al puntuar por tokens.
+
+MATCH_THRESHOLD = 0.75
+BLOCK_PREFIX = 4
+# Bloques más grandes que esto (nombres de pila comunes: "juan", "carl") no
+# discriminan: se ignoran si el nombre tiene algún otro bloque más chico.
+MAX_BLOCK_SIZE = 200
+PARTICLES = {"de", "da", "do", "dos", "das", "del", "la", "le", "van", "von", "der", "den", "di", "jr", "junior", "e", "y"}
+
+
+def name_tokens(name):
+    return [t for t in re.split(r"[^a-z0-9]+", normalize(name)) if t]
+
+
+def block_keys(tokens, year=None):
+    keys = {t[:BLOCK_PREFIX] for t in tokens if len(t) >= 3 and t not in PARTICLES}
+    if year is not None:
+        keys = {f"{key}|{year}" for key in keys}
+    return keys
+
+
+def _indexed_keys(tokens, year):
+    # Cada fila se indexa sin año (para consultas sin año) y con su año, o con "?"
+    # si no lo tiene, para que una consulta con año también la encuentre.
+    return block_keys(tokens) | block_keys(tokens, year or "?")
+
+
+def _query_keys(tokens, year):
+    if year is None:
+        return block_keys(tokens)
+    return block_keys(tokens, year) | block_keys(tokens, "?")
+
+
+def _token_similarity(a, b):
+    if a == b:
+        return 1.0
+    # Inicial ("j") o abreviatura ("vini" de "vinicius").
+    if len(a) == 1 or len(b) == 1:
+        return 0.8 if a[0] == b[0] else 0.0
+    if a.startswith(b) or b.startswith(a):
+        return 0.85 if min(len(a), len(b)) >= 3 else 0.0
+    ratio = SequenceMatcher(None, a, b).ratio()
+    return ratio if ratio >= 0.8 else 0.0
+
+
+def name_score(left_tokens, right_tokens):
+    """Similitud entre 0 y 1, independiente del orden de los nombres."""
+    left = [t for t in left_tokens if t not in PARTICLES] or left_tokens
+    right = [t for t in right_tokens if t not in PARTICLES] or right_tokens
+    if not left or not right:
+        return 0.0
+    shorter, longer = (left, right) if len(left) <= len(right) else (right, left)
+    available = list(longer)
+    total = 0.0
+    for token in shorter:
+        best, best_pos = 0.0, None
+        for pos, other in enumerate(available):
+            similarity = _token_similarity(token, other)
+            if similarity > best:
+                best, best_pos = similarity, pos
+        if best_pos is not None:
+            available.pop(best_pos)
+        total += best
+    # Los tokens sin pareja del nombre más largo penalizan poco (segundos nombres, apellidos completos).
+    return total / (len(shorter) + 0.1 * (len(longer) - len(shorter)))
+
+
+class NameBlockIndex:
+    def __init__(self, names, years=None):
+        self.tokens = [name_tokens(name) for name in names]
+        self.years = list(years) if years is not None else [None] * len(self.tokens)
+        self.blocks = defaultdict(list)
+        for pos, (tokens, year) in enumerate(zip(self.tokens, self.years)):
+            for key in _indexed_keys(tokens, _year(year)):
+                self.blocks[key].append(pos)
+
+    def candidates(self, tokens, year=None):
+        buckets = [self.blocks[key] for key in _query_keys(tokens, _year(year)) if key in self.blocks]
+        if not buckets:
+            return set()
+        selective = [bucket for bucket in buckets if len(bucket) <= MAX_BLOCK_SIZE]
+        found = set()
+        for bucket in selective or [min(buckets, key=len)]:
+            found.update(bucket)
+        return found
+
+    def best_matches(self, names, years=None, threshold=MATCH_THRESHOLD):
+        """Empareja uno a uno cada nombre con el mejor candidato del índice.
+        Devuelve [(pos_izquierda, pos_derecha, score)]."""
+        years = list(years) if years is not None else [None] * len(names)
+        scored = []
+        for left_pos, (name, year) in enumerate(zip(names, years)):
+            tokens = name_tokens(name)
+            for right_pos in self.candidates(tokens, year):
+                score = name_score(tokens, self.tokens[right_pos])
+                if score >= threshold:
+                    scored.append((score, left_pos, right_pos))
+
+        matches, used_left, used_right = [], set(), set()
+        for score, left_pos, right_pos in sorted(scored, key=lambda s: (-s[0], s[1], s[2])):
+            if left_pos in used_left or right_pos in used_right:
+                continue
+            used_left.add(left_pos)
+            used_right.add(right_pos)
+            matches.append((left_pos, right_pos, round(score, 4)))
+        return matches
+
+
+def _year(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    match = re.search(r"(19|20)\d{2}", str(value))
+    return match.group(0) if match else None
+
+
+def fuzzy_merge(left, right, left_on, right_on, left_year=None, right_year=None, threshold=MATCH_THRESHOLD, score_column="match_score"):
+    """Left join por nombre aproximado. Agrega las columnas de `right` y el score del match.
+    El año de nacimiento solo se usa como bloque si ambos lados lo tienen."""
+    use_years = left_year in left.columns and right_year in right.columns if left_year and right_year else False
+    index = NameBlockIndex(right[right_on].tolist(), right[right_year].tolist() if use_years else None)
+    matches = index.best_matches(left[left_on].tolist(), left[left_year].tolist() if use_years else None, threshold)
+
+    # -1 no existe en el índice de `right`: las filas sin match quedan en NaN.
+    positions = [-1] * len(left)
+    scores = [float("nan")] * len(left)
+    for left_pos, matched, score in matches:
+        positions[left_pos] = matched
+        scores[left_pos] = score
+
+    matched_rows = right.reset_index(drop=True).reindex(positions).reset_index(drop=True)
+    merged = pd.concat([left.reset_index(drop=True), matched_rows], axis=1)
+    merged[score_column] = scores
+    return merged
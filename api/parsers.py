@@ -0,0 +1,70 @@
+import pandas as pd
+
+# Conversión vectorizada de los valores que devuelven los scrapers. Los scrapers
+# guardan el texto tal cual aparece en transfermarkt ("12,50 mill. €", "1,85m",
+# "24/06/1987 (36)") y acá se convierten columnas enteras de una sola pasada.
+
+MONEY_PATTERN = r"(?P<number>\d+(?:\.\d{3})*(?:,\d+)?)\s*(?P<unit>mill|mil)?"
+MONEY_UNITS = {"mill": 1_000_000, "mil": 1_000}
+
+TRANSFER_TYPES = ("fee", "free", "loan", "unknown")
+
+
+def _text(series):
+    return series.astype("string").str.strip().str.lower()
+
+
+def parse_money(series):
+    """'12,50 mill. €' -> 12500000, '500 mil €' -> 500000. Lo que no es un monto queda NA."""
+    parts = _text(series).str.extract(MONEY_PATTERN)
+    number = pd.to_numeric(
+        parts["number"].str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+        errors="coerce",
+    )
+    scale = parts["unit"].map(MONEY_UNITS).fillna(1)
+    return (number * scale).round().astype("Int64")
+
+
+def transfer_type(series):
+    text = _text(series).fillna("")
+    kinds = pd.Series("unknown", index=series.index, dtype="object")
+    kinds[parse_money(series).fillna(0) > 0] = "fee"
+    kinds[text.str.contains("libre|coste|free", regex=True)] = "free"
+    # Una cesión puede tener tarifa: el monto se conserva, pero el tipo es "loan".
+    kinds[text.str.contains("cesión|cesion|préstamo|loan", regex=True)] = "loan"
+    return kinds
+
+
+def parse_height(series):
+    """'1,85m' -> 185 (cm); 'indeterminado' o vacío -> NA."""
+    meters = _text(series).str.extract(r"(\d+(?:[.,]\d+)?)\s*m", expand=False)
+    meters = pd.to_numeric(meters.str.replace(",", ".", regex=False), errors="coerce")
+    return (meters * 100).round().astype("Int64")
+
+
+def parse_birth(series):
+    """'24/06/1987 (36)' -> ('24/06/1987', 36)."""
+    parts = series.astype("string").str.extract(r"^\s*(?P<date>[^(]*?)\s*\((?P<age>\d+)\)")
+    return parts["date"].fillna("N/A"), pd.to_numeric(parts["age"], errors="coerce").astype("Int64")
+
+
+def parse_transfers(df):
+    if df.empty or "amount" not in df.columns:
+        return df
+    raw = df["amount"]
+    df = df.assign(amount=parse_money(raw).fillna(0).astype("int64"))
+    df.insert(df.columns.get_loc("amount") + 1, "transfer_type", transfer_type(raw))
+    return df
+
+
+def parse_players(df):
+    if df.empty:
+        return df
+    df = df.copy()
+    if "valor" in df.columns:
+        df["valor"] = parse_money(df["valor"]).fillna(0).astype("int64")
+    if "altura" in df.columns:
+        df["altura"] = parse_height(df["altura"])
+    if "fecha de nacimiento" in df.columns:
+        df["fecha de nacimiento"], df["edad"] = parse_birth(df["fecha de nacimiento"])
+    return df
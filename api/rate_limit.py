@@ -0,0 +1,72 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+# Rate limiting por host para los scrapers. Cada host tiene su token bucket
+# (requests por segundo + ráfaga), compartido por todos los hilos del
+# orquestador de main.py: la cortesía con cada sitio no depende de cuántos
+# jobs corran en paralelo ni de sleeps fijos.
+
+BURST = int(os.getenv("SCRAPER_BURST", "2"))
+
+HOST_RATES = {
+    "www.transfermarkt.com.ar": float(os.getenv("SCRAPER_RATE_TRANSFERMARKT_AR", "1")),
+    "www.transfermarkt.es": float(os.getenv("SCRAPER_RATE_TRANSFERMARKT_ES", "1")),
+    "tmapi-alpha.transfermarkt.technology": float(os.getenv("SCRAPER_RATE_TMAPI", "4")),
+    "www.capology.com": float(os.getenv("SCRAPER_RATE_CAPOLOGY", "0.5")),
+}
+DEFAULT_RATE = float(os.getenv("SCRAPER_RATE_DEFAULT", "1"))
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=BURST):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Toma un token, esperando lo necesario. Devuelve los segundos esperados."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # El token se reserva ya (puede quedar en negativo): los hilos que llegan
+            # después esperan su turno en orden, sin despertarse todos juntos.
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+_buckets = {}
+_requests = defaultdict(int)
+_waited = defaultdict(float)
+_lock = threading.Lock()
+
+
+def bucket_for(host):
+    with _lock:
+        if host not in _buckets:
+            _buckets[host] = TokenBucket(HOST_RATES.get(host, DEFAULT_RATE))
+        return _buckets[host]
+
+
+def throttle(url):
+    """Bloquea hasta que el host de `url` admita un request más."""
+    host = urlparse(url).hostname or ""
+    waited = bucket_for(host).acquire()
+    with _lock:
+        _requests[host] += 1
+        _waited[host] += waited
+
+
+def stats():
+    with _lock:
+        return {host: {"requests": count, "waited_seconds": round(_waited[host], 2)} for host, count in _requests.items()}
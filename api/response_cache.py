@@ -0,0 +1,166 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from .sqlite_store import SQLiteStore
+
+# Cache de las respuestas del LLM (/api/summary, /api/squadAnalysis). Esas
+# respuestas solo cambian cuando cambian los datos del club/temporada, así que
+# la clave lleva un token de versión por club y temporada que suben
+# execute_s3_transfer y ingest_data: un movimiento o una ingesta invalidan lo
+# cacheado sin tener que borrar nada a mano.
+#
+# Vive en SQLite (api/sqlite_store.py, como api/club_cache.py) para
+# sobrevivir reinicios y compartirse entre workers. Si llegan varios pedidos
+# iguales a la vez, solo uno llama al LLM (single-flight): dentro del proceso
+# con un lock por clave y entre procesos con una reserva en la tabla inflight.
+#
+# Si la base no se puede abrir (p. ej. un filesystem de solo lectura como el de
+# Vercel) el cache queda desactivado: se calcula cada respuesta y los bumps no
+# hacen nada, pero ni las transferencias ni los endpoints fallan por eso.
+
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", str(Path(__file__).resolve().parent.parent / ".cache" / "responses.sqlite"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_DAYS", "30")) * 24 * 3600
+# Una reserva más vieja que esto se considera abandonada (el worker murió a mitad de la llamada).
+RESPONSE_LEASE_SECONDS = float(os.getenv("RESPONSE_LEASE_SECONDS", "120"))
+LEASE_POLL_SECONDS = 0.25
+
+_store = SQLiteStore(
+    RESPONSE_CACHE_PATH,
+    "CREATE TABLE IF NOT EXISTS versions ("
+    "club TEXT NOT NULL, season TEXT NOT NULL, version INTEGER NOT NULL, PRIMARY KEY (club, season))",
+    "CREATE TABLE IF NOT EXISTS responses ("
+    "kind TEXT NOT NULL, club TEXT NOT NULL, season TEXT NOT NULL, version INTEGER NOT NULL, "
+    "value TEXT NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (kind, club, season, version))",
+    "CREATE TABLE IF NOT EXISTS inflight (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)",
+)
+_disabled = False
+_flights = {}
+_flights_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "waits": 0}
+
+
+def _available():
+    global _disabled
+    if _disabled:
+        return False
+    try:
+        _store.connect()
+    except (sqlite3.Error, OSError) as e:
+        _disabled = True
+        print(f"⚠️ No se pudo abrir el cache de respuestas en {RESPONSE_CACHE_PATH} ({e}); queda desactivado.")
+        return False
+    return True
+
+
+def _scope(club, season):
+    return club.strip().lower(), str(season)
+
+
+def data_version(club, season):
+    if not _available():
+        return 0
+    row = _store.connect().execute("SELECT version FROM versions WHERE club = ? AND season = ?", _scope(club, season)).fetchone()
+    return row[0] if row else 0
+
+
+def bump_data_version(club, season):
+    """Invalida las respuestas cacheadas de club/temporada. Devuelve la versión nueva."""
+    if not _available():
+        return 0
+    club, season = _scope(club, season)
+    with _store.transaction() as conn:
+        conn.execute(
+            "INSERT INTO versions (club, season, version) VALUES (?, ?, 1) "
+            "ON CONFLICT(club, season) DO UPDATE SET version = version + 1",
+            (club, season),
+        )
+        version = conn.execute("SELECT version FROM versions WHERE club = ? AND season = ?", (club, season)).fetchone()[0]
+        # Las respuestas de versiones anteriores ya no se pueden pedir.
+        conn.execute("DELETE FROM responses WHERE club = ? AND season = ? AND version < ?", (club, season, version))
+    return version
+
+
+def _get(kind, club, season, version):
+    row = _store.connect().execute(
+        "SELECT value FROM responses WHERE kind = ? AND club = ? AND season = ? AND version = ? AND created_at >= ?",
+        (kind, club, season, version, time.time() - RESPONSE_CACHE_TTL_SECONDS),
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _put(kind, club, season, version, value):
+    with _store.transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (kind, club, season, version, value, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (kind, club, season, version, json.dumps(value, ensure_ascii=False), time.time()),
+        )
+
+
+def _acquire_lease(key, owner):
+    with _store.transaction() as conn:
+        conn.execute("DELETE FROM inflight WHERE key = ? AND expires_at < ?", (key, time.time()))
+        taken = conn.execute(
+            "INSERT OR IGNORE INTO inflight (key, owner, expires_at) VALUES (?, ?, ?)",
+            (key, owner, time.time() + RESPONSE_LEASE_SECONDS),
+        ).rowcount
+    return taken == 1
+
+
+def _release_lease(key, owner):
+    _store.connect().execute("DELETE FROM inflight WHERE key = ? AND owner = ?", (key, owner))
+
+
+def _count(name):
+    with _flights_lock:
+        _stats[name] += 1
+
+
+def _flight_lock(key):
+    with _flights_lock:
+        return _flights.setdefault(key, threading.Lock())
+
+
+def cached_response(kind, club, season, compute):
+    """Devuelve la respuesta cacheada de `kind` para la versión actual de los datos,
+    o la calcula con `compute()` una sola vez aunque haya pedidos concurrentes."""
+    if not _available():
+        return compute()
+    club, season = _scope(club, season)
+    version = data_version(club, season)
+    value = _get(kind, club, season, version)
+    if value is not None:
+        _count("hits")
+        return value
+
+    key = f"{kind}:{club}:{season}:{version}"
+    with _flight_lock(key):
+        owner = uuid.uuid4().hex
+        while True:
+            # Otro hilo u otro proceso pudo haberla calculado mientras se esperaba.
+            value = _get(kind, club, season, version)
+            if value is not None:
+                _count("waits")
+                return value
+            if _acquire_lease(key, owner):
+                break
+            time.sleep(LEASE_POLL_SECONDS)
+
+        try:
+            _count("misses")
+            value = compute()
+            if value is not None:
+                _put(kind, club, season, version, value)
+            return value
+        finally:
+            _release_lease(key, owner)
+            with _flights_lock:
+                _flights.pop(key, None)
+
+
+def stats():
+    with _flights_lock:
+        return dict(_stats)
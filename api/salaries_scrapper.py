@@ -4,57 +4,83 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+from rate_limit import throttle
+from http_cache import fetch, season_max_age
+from browser_pool import make_pool
+from html_parsing import parse_salaries
 import json
+import os
 import pandas as pd
+import requests
 import time
 
 with open("urls.json", "r") as f:
     urls = json.load(f)
 
-def get_salaries(club: str, temporada: str):
-    url = f"{urls[club]["salaries"]}{temporada}-{int(temporada) + 1}"
+# Si la tabla de sueldos ya viene en el HTML inicial se lee con un GET común y
+# se evita el navegador; si no, se usa una sesión del pool de Chrome.
+SALARIES_FAST_PATH = os.getenv("SALARIES_FAST_PATH", "1") == "1"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+def new_driver():
     chrome_options = Options()
-    chrome_options.add_argument("--headless") 
+    chrome_options.add_argument("--headless")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+    chrome_options.add_argument(f"user-agent={HEADERS['User-Agent']}")
+    return webdriver.Chrome(options=chrome_options)
+
+browsers = make_pool(new_driver)
 
-    driver = webdriver.Chrome(options=chrome_options)
+def wait_rows_stable(driver, timeout=3, poll=0.25):
+    # Reemplaza el sleep fijo: espera a que la cantidad de filas deje de crecer.
+    previous = -1
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        count = len(driver.find_elements(By.CSS_SELECTOR, "#table tbody tr"))
+        if count == previous:
+            return count
+        previous = count
+        time.sleep(poll)
+    return previous
 
+def fetch_salaries_html(url, temporada):
     try:
-        driver.get(url)
-        wait = WebDriverWait(driver, 15)
-        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "#table tbody tr")))
-        time.sleep(2)
-
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        header_row = soup.find('table', id='table').find('thead').find_all('tr')[-1]
-        headers = [th.get_text(strip=True) for th in header_row.find_all('th')]
-        
-        try:
-            target_col_index = next(i for i, h in enumerate(headers) if "Gross P/Y" in h)
-        except StopIteration:
-            print("❌ No se encontró la columna de sueldo anual.")
+        response = fetch(url, headers=HEADERS, max_age=season_max_age(temporada), timeout=15)
+        response.raise_for_status()
+        return parse_salaries(response.text)
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ Falló la descarga directa de sueldos ({temporada}): {e}")
+        return None
+
+def get_salaries(club: str, temporada: str):
+    url = f"{urls[club]["salaries"]}{temporada}-{int(temporada) + 1}"
+
+    if SALARIES_FAST_PATH:
+        df = fetch_salaries_html(url, temporada)
+        # None (sin tabla) o vacío (sin la columna de sueldo): se prueba con el navegador.
+        if df is not None and not df.empty:
+            print(f"✅ Éxito ({temporada}): Se encontraron {len(df)} jugadores (sin navegador).")
+            return df
+
+    try:
+        with browsers.session() as driver:
+            throttle(url)
+            driver.get(url)
+            wait = WebDriverWait(driver, 15)
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "#table tbody tr")))
+            wait_rows_stable(driver)
+            df = parse_salaries(driver.page_source)
+
+        if df is None:
+            print("❌ No se encontró la tabla de sueldos.")
             return pd.DataFrame()
 
-        rows = soup.find('table', id='table').find('tbody').find_all('tr')
-        players_data = []
-        
-        for row in rows:
-            cols = row.find_all('td')
-            if len(cols) > target_col_index:
-                players_data.append({
-                    "nombre": cols[0].get_text(strip=True),
-                    "sueldo_anual": cols[target_col_index].get_text(strip=True).replace('£', '').replace(',', '').replace(' ', ''),
-                })
-
-        print(f"✅ Éxito ({temporada}): Se encontraron {len(players_data)} jugadores.")
-        return pd.DataFrame(players_data)
-    
+        print(f"✅ Éxito ({temporada}): Se encontraron {len(df)} jugadores.")
+        return df
+
     except Exception as e:
         print(f"❌ Error con Selenium: {e}")
-        return []
-    finally:
-        driver.quit()
-
+        return pd.DataFrame()
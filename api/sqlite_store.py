@@ -0,0 +1,52 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# Base común de los caches persistentes en SQLite (club_cache, response_cache,
+# ia/embedding_cache): modo WAL para que lean varios procesos mientras otro
+# escribe, una conexión por hilo (sqlite3 no comparte conexiones entre hilos) y
+# escrituras en transacciones IMMEDIATE, que toman el lock de escritura al
+# empezar en vez de fallar a mitad de camino.
+
+# SQLite limita la cantidad de parámetros por consulta.
+MAX_PARAMS = 500
+
+
+class SQLiteStore:
+    def __init__(self, path, *schema):
+        """`schema` son las sentencias (o funciones que reciben la conexión) que
+        preparan las tablas; corren una vez por conexión."""
+        self.path = path
+        self.schema = schema
+        self._local = threading.local()
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for step in self.schema:
+                step(conn) if callable(step) else conn.execute(step)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+
+    def query_in(self, sql, values, params=()):
+        """Corre `sql` (con "IN ({})") por bloques de `values` y junta las filas.
+        `params` va antes de los valores del IN."""
+        conn = self.connect()
+        values = list(values)
+        rows = []
+        for i in range(0, len(values), MAX_PARAMS):
+            chunk = values[i:i + MAX_PARAMS]
+            rows.extend(conn.execute(sql.format(",".join("?" * len(chunk))), [*params, *chunk]).fetchall())
+        return rows
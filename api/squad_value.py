@@ -0,0 +1,110 @@
+import pandas as pd
+from .aws_s3 import read_aws_csv, put_conditional, serialize_dataset, invalidate_dataset, ConflictError
+from .ledger import dataset_path, read_dataset, read_datasets
+
+# Tabla materializada con la última valoración de cada jugador del plantel
+# (datasets/{club}/{season}/{club}_{season}_latest_valuations.csv). La escribe la
+# ingesta (main.py) a partir de get_all_team_valuations y se mantiene con los
+# eventos del ledger, así el valor del plantel no recorre el historial completo.
+
+LATEST_VALUATIONS = "latest_valuations"
+LATEST_VALUATION_COLUMNS = ["player_id", "nombre_jugador", "posicion", "valuation_amount", "valuation_date"]
+
+
+def _id_key(series):
+    return series.astype(str).str.replace(".0", "", regex=False)
+
+
+def latest_valuations(df_valuations, df_players=None):
+    if df_valuations is None or df_valuations.empty or "player_id" not in df_valuations.columns:
+        return pd.DataFrame(columns=LATEST_VALUATION_COLUMNS)
+
+    # El historial llega en orden cronológico: si alguna fecha no se puede parsear,
+    # el orden original decide (sort estable).
+    frame = df_valuations.assign(
+        _pid=_id_key(df_valuations["player_id"]),
+        _date=pd.to_datetime(df_valuations.get("valuation_date"), errors="coerce"),
+    )
+    frame = frame.sort_values("_date", kind="stable", na_position="first")
+    latest = frame.drop_duplicates("_pid", keep="last")
+
+    if df_players is not None and "posicion" in df_players.columns and "player_id" in df_players.columns:
+        positions = dict(zip(_id_key(df_players["player_id"]), df_players["posicion"]))
+        latest = latest.assign(posicion=latest["_pid"].map(positions))
+
+    latest = latest.reindex(columns=LATEST_VALUATION_COLUMNS)
+    latest["valuation_amount"] = pd.to_numeric(latest["valuation_amount"], errors="coerce").fillna(0)
+    return latest.reset_index(drop=True)
+
+
+def materialize_latest_valuations(club, season):
+    """Crea la tabla para temporadas ingeridas antes de que existiera, a partir de los
+    snapshots base. Hereda el ledger-seq del snapshot de valoraciones, así los
+    eventos posteriores se siguen aplicando encima."""
+    df_valuations = read_aws_csv(dataset_path(club, season, "valuations"))
+    if df_valuations is None:
+        return False
+    df_players = read_aws_csv(dataset_path(club, season, "players"), ["player_id", "posicion"])
+
+    path = dataset_path(club, season, LATEST_VALUATIONS)
+    key, body = serialize_dataset(latest_valuations(df_valuations, df_players), path)
+    try:
+        put_conditional(key, body, metadata={"ledger-seq": str(df_valuations.attrs.get("ledger_seq", 0))})
+    except ConflictError:
+        # Otro proceso la creó primero.
+        pass
+    invalidate_dataset(path)
+    return True
+
+
+def read_latest_valuations(club, season):
+    if read_aws_csv(dataset_path(club, season, LATEST_VALUATIONS), ["player_id"]) is None:
+        if not materialize_latest_valuations(club, season):
+            return None
+    return read_dataset(club, season, LATEST_VALUATIONS)
+
+
+def transfer_value_deltas(df_altas, df_bajas):
+    deltas = []
+    for df, sign in ((df_altas, 1), (df_bajas, -1)):
+        if df is None or "market_value" not in df.columns:
+            continue
+        for row in df[df["market_value"].notna()].to_dict(orient="records"):
+            value = pd.to_numeric(row["market_value"], errors="coerce")
+            deltas.append({
+                "player_id": row.get("player_id"),
+                "player_name": row.get("player_name"),
+                "from_club": row.get("from_club"),
+                "to_club": row.get("to_club"),
+                "transfer_date": row.get("transfer_date"),
+                "amount": row.get("amount"),
+                "value_delta": 0.0 if pd.isna(value) else sign * float(value),
+            })
+    return sorted(deltas, key=lambda d: str(d["transfer_date"] or ""))
+
+
+def get_squad_value(club, season):
+    df_latest = read_latest_valuations(club, season)
+    if df_latest is None:
+        return None
+    df_altas, df_bajas = read_datasets(club, season, "altas", "bajas")
+
+    values = pd.to_numeric(df_latest["valuation_amount"], errors="coerce").fillna(0)
+    by_position = (
+        pd.DataFrame({"posicion": df_latest["posicion"].fillna("N/A"), "valor": values})
+        .groupby("posicion", sort=False)["valor"]
+        .agg(["sum", "count"])
+        .sort_values("sum", ascending=False)
+    )
+
+    return {
+        "club": club,
+        "season": season,
+        "squad_value": float(values.sum()),
+        "players": int(len(df_latest)),
+        "by_position": [
+            {"posicion": pos, "valor": float(row["sum"]), "jugadores": int(row["count"])}
+            for pos, row in by_position.iterrows()
+        ],
+        "transfers": transfer_value_deltas(df_altas, df_bajas),
+    }
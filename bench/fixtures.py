@@ -0,0 +1,167 @@
+import json
+import random
+from functools import lru_cache
+from pathlib import Path
+
+# Respuestas para el benchmark de scrapers. Si en bench/fixtures/ hay páginas
+# grabadas (players.html, transfers.html, salaries.html, club.html,
+# history.json) se usan esas; si no, se generan páginas sintéticas con la
+# misma estructura que transfermarkt / capology / tmapi. Se generan una vez y
+# se reutilizan, para que el servidor local no pese en las mediciones.
+#
+# Las grabadas del repo son de un club de ejemplo, limpias (sin scripts externos,
+# anuncios ni parámetros en las URLs) y con nombres inventados;
+# bench/record_fixtures.py las reemplaza por las páginas reales de un club.
+#
+# Con quirks=True las páginas de jugadores y transferencias traen lo que suele
+# aparecer en el HTML real y no en el sintético: entidades y acentos, &nbsp;,
+# comentarios y saltos de línea entre celdas, tags void con "/>" y un <script>
+# que contiene markup de una tabla "items" (ver bench/parser_parity.py).
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+
+POSITIONS = ["Portero", "Defensa central", "Lateral derecho", "Pivote", "Mediocentro", "Extremo izquierdo", "Delantero centro"]
+CLUBS = ["River Plate", "Boca Juniors", "Real Madrid", "FC Barcelona", "Arsenal FC", "Manchester City", "Ajax", "Benfica"]
+
+
+def _recorded(name):
+    path = FIXTURE_DIR / name
+    return path.read_bytes() if path.exists() else None
+
+
+def _page(body, noise):
+    # Navegación, scripts y publicidad alrededor de la tabla, como en la página real.
+    filler = "".join(
+        f'<div class="nav-item"><script>window.tm_{i}={{"slot":{i}}};</script>'
+        f'<a href="/link/{i}">Link {i}</a><p>Texto <b>{i}</b> de relleno</p></div>'
+        for i in range(noise)
+    )
+    return f"<!DOCTYPE html><html><head><title>TM</title></head><body>{filler}{body}{filler}</body></html>"
+
+
+def _money(rnd):
+    if rnd.random() < 0.6:
+        return f"{rnd.randint(1, 120)},{rnd.randint(0, 99):02d} mill. €"
+    return f"{rnd.randint(100, 950)} mil €"
+
+
+def player_ids(squad_size):
+    return [100000 + i for i in range(squad_size)]
+
+
+def _name(player_id, quirks):
+    return f"J&uacute;li&aacute;n &Aacute;lvarez&nbsp;{player_id}" if quirks else f"Jugador {player_id}"
+
+
+def _quirky(cells, quirks):
+    if not quirks:
+        return "".join(cells)
+    return "".join(f"\n    <!-- celda {i} -->{cell}" for i, cell in enumerate(cells)).replace('.png">', '.png" />')
+
+
+def _decoy(quirks):
+    # Markup de tabla dentro de un script: ningún parser lo debería tomar como tabla.
+    return """<script>document.write('<table class="items"><tbody><tr><td>x</td></tr></tbody></table>');</script>""" if quirks else ""
+
+
+@lru_cache(maxsize=None)
+def players_html(squad_size=30, noise=3000, seed=1, quirks=False):
+    recorded = _recorded("players.html")
+    if recorded is not None:
+        return recorded
+    rnd = random.Random(seed)
+    rows = []
+    for i, player_id in enumerate(player_ids(squad_size)):
+        cells = [
+            f'<td class="zentriert rueckennummer"><div class="rn_nummer">{i + 1}</div></td>',
+            f'<td class="posrela"><table class="inline-table"><tr><td rowspan="2"><img src="/img/{player_id}.png"></td>'
+            f'<td class="hauptlink"><a href="/jugador/profil/spieler/{player_id}">{_name(player_id, quirks)}</a></td></tr>'
+            f'<tr><td>{rnd.choice(POSITIONS)}</td></tr></table></td>',
+            f'<td class="zentriert">{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/{rnd.randint(1988, 2006)} ({rnd.randint(18, 36)})</td>',
+            f'<td class="zentriert"><img title="{rnd.choice(["Argentina", "España", "Brasil", "Inglaterra"])}" src="/flag.png"></td>',
+            f'<td class="zentriert">1,{rnd.randint(65, 99)}m</td>',
+            f'<td class="zentriert">{rnd.choice(["derecho", "izquierdo", "ambidiestro"])}</td>',
+            f'<td class="zentriert">01/07/20{rnd.randint(15, 24)}</td>',
+            f'<td class="zentriert"><a title="{rnd.choice(CLUBS)}: Ablöse {_money(rnd)}" href="#">c</a></td>',
+            f'<td class="zentriert">30/06/20{rnd.randint(25, 30)}</td>',
+            f'<td class="rechts hauptlink"><a href="#">{_money(rnd)}</a></td>',
+        ]
+        rows.append(f'<tr class="{"odd" if i % 2 else "even"}">{_quirky(cells, quirks)}</tr>')
+    table = f'{_decoy(quirks)}<table class="items"><thead><tr><th>#</th></tr></thead><tbody>{"".join(rows)}</tbody></table>'
+    return _page(table, noise).encode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def transfers_html(rows_per_table=25, noise=3000, seed=2, quirks=False):
+    recorded = _recorded("transfers.html")
+    if recorded is not None:
+        return recorded
+    rnd = random.Random(seed)
+
+    def row(i):
+        amount = rnd.choice([
+            f'<a href="#">{_money(rnd)}</a>',
+            '<i class="normaler-text">Libre</i>',
+            '<i class="normaler-text">Cesión</i>',
+            f'<a href="#">Tarifa de cesión: {_money(rnd)}</a>',
+        ])
+        if quirks:
+            amount = amount.replace(" mill.", "&nbsp;mill.")
+        cells = [
+            f'<td class="hauptlink"><a href="/jugador/profil/spieler/{200000 + i}">{_name(200000 + i, quirks)}</a></td>',
+            *(f"<td>c{j}</td>" for j in range(4)),
+            f'<td><table class="inline-table"><tr><td>{rnd.choice(POSITIONS)}</td></tr></table></td>',
+            f'<td>{rnd.randint(18, 35)}</td>',
+            f'<td><a title="{rnd.choice(CLUBS)}" href="#">club</a></td>',
+            "<td>a</td>", "<td>b</td>", "<td>c</td>",
+            f"<td>{amount}</td>",
+        ]
+        return f'<tr class="{"odd" if i % 2 else "even"}">{_quirky(cells, quirks)}</tr>'
+
+    tables = _decoy(quirks) + "".join(
+        f'<table class="items"><tbody>{"".join(row(k * rows_per_table + i) for i in range(rows_per_table))}</tbody></table>'
+        for k in range(2)
+    )
+    return _page(tables, noise).encode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def history_json(player_id, entries=20):
+    recorded = _recorded("history.json")
+    if recorded is not None:
+        return recorded
+    rnd = random.Random(player_id)
+    history = [
+        {
+            "clubId": str(rnd.choice(range(1, 40))),
+            "age": 18 + i // 2,
+            "marketValue": {"value": rnd.randint(1, 200) * 100000, "determined": f"{2010 + i // 2}-{1 + 6 * (i % 2):02d}-01"},
+        }
+        for i in range(entries)
+    ]
+    return json.dumps({"success": True, "data": {"history": history}}).encode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def club_html(club_id, noise=500):
+    recorded = _recorded("club.html")
+    if recorded is not None:
+        return recorded
+    return _page(f'<h1 class="data-header__headline-wrapper">Club {club_id} FC</h1>', noise).encode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def salaries_html(squad_size=30, noise=2000, seed=3):
+    recorded = _recorded("salaries.html")
+    if recorded is not None:
+        return recorded
+    rnd = random.Random(seed)
+    rows = "".join(
+        f"<tr><td>Jugador {player_id}</td><td>£{rnd.randint(10, 400)},000</td><td>£ {rnd.randint(1, 20)},{rnd.randint(100, 999)},000</td></tr>"
+        for player_id in player_ids(squad_size)
+    )
+    table = (
+        '<table id="table"><thead><tr><th>Player</th><th>Gross P/W (GBP)</th><th>Gross P/Y (GBP)</th></tr></thead>'
+        f"<tbody>{rows}</tbody></table>"
+    )
+    return _page(table, noise).encode("utf-8")
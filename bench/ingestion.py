@@ -0,0 +1,248 @@
+"""Benchmark offline de la ingesta de embeddings.
+
+Usa un cliente de embeddings y un índice falsos, con latencia simulada por
+request, para comparar la ingesta fila por fila y secuencial por tipo con el
+pipeline de ia/ingestion.py (lotes por tokens, tipos en paralelo, upserts a
+medida que llegan los embeddings). Los documentos salen de DataFrames con las
+columnas de los scrapers, pasados por ia/documents.py. Después aplica un
+traspaso simulado con el mismo código del ledger (api/ledger.py: se va un
+jugador, llega otro y las tablas ganan las columnas "club", "to_club"...),
+reingesta sobre el mismo índice (solo deberían embeberse las filas que
+cambiaron) y
+reingesta en un índice vacío con el cache de embeddings caliente. En cada caso
+verifica que el índice quede con un vector por fila y que cada vector
+corresponda a su texto.
+
+    python bench/ingestion.py --rows 2000 --latency 150 --json bench_ingestion.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+# El cache de embeddings del benchmark no se mezcla con el real.
+os.environ["EMBEDDING_CACHE_PATH"] = str(Path(tempfile.mkdtemp()) / "embeddings.sqlite")
+
+from api.ledger import apply_events, event_key  # noqa: E402
+from ia import ingestion  # noqa: E402
+from ia.documents import dataset_prefix, frame_documents  # noqa: E402
+
+CLUB, SEASON = "Boca", "2024"
+DIMENSION = 8
+CSV_TYPES = {"altas": 0.05, "bajas": 0.05, "players": 0.15, "valuations": 0.75}
+
+
+def fake_embedding(text):
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [b / 255 for b in digest[:DIMENSION]]
+
+
+class FakeEmbeddings:
+    def __init__(self, latency, per_input):
+        self.latency = latency
+        self.per_input = per_input
+        self.requests = 0
+        self.inputs = 0
+        self.lock = threading.Lock()
+
+    def create(self, input, model):
+        texts = [input] if isinstance(input, str) else input
+        with self.lock:
+            self.requests += 1
+            self.inputs += len(texts)
+        time.sleep(self.latency + self.per_input * len(texts))
+        # Se devuelve desordenado a propósito: el pipeline tiene que respetar `index`.
+        data = [SimpleNamespace(index=i, embedding=fake_embedding(t)) for i, t in enumerate(texts)]
+        return SimpleNamespace(data=data[::-1])
+
+
+class FakeClient:
+    def __init__(self, latency, per_input):
+        self.embeddings = FakeEmbeddings(latency, per_input)
+
+
+class FakeIndex:
+    def __init__(self, latency):
+        self.latency = latency
+        self.vectors = {}
+        self.calls = 0
+        self.deletes = 0
+        self.lock = threading.Lock()
+
+    def upsert(self, vectors):
+        time.sleep(self.latency)
+        with self.lock:
+            self.calls += 1
+            for vector in vectors:
+                self.vectors[vector["id"]] = vector
+
+    def list(self, prefix):
+        ids = sorted(key for key in self.vectors if key.startswith(prefix))
+        for start in range(0, len(ids), 100):
+            yield ids[start:start + 100]
+
+    def delete(self, ids):
+        time.sleep(self.latency)
+        with self.lock:
+            self.deletes += len(ids)
+            for key in ids:
+                self.vectors.pop(key, None)
+
+
+def build_frames(total):
+    counts = {csv_type: max(1, int(total * share)) for csv_type, share in CSV_TYPES.items()}
+    squad = counts["players"]
+    ids = [str(100000 + i) for i in range(squad)]
+    return {
+        "players": pd.DataFrame({
+            "player_id": ids,
+            "número": [str(i % 40 + 1) for i in range(squad)],
+            "nombre y apellido": [f"Jugador {i}" for i in range(squad)],
+            "posicion": [("Portero", "Defensa central", "Mediocentro", "Delantero centro")[i % 4] for i in range(squad)],
+            "edad": [None] * squad,
+            "valor": [f"{(i % 90 + 1) / 10:.1f} mill. €" for i in range(squad)],
+        }),
+        "valuations": pd.DataFrame([
+            {"player_id": ids[i % squad], "nombre_jugador": f"Jugador {i % squad}",
+             "valuation_amount": (i % 90 + 1) * 100000, "valuation_date": f"{2010 + i // squad}-0{1 + i % 9}-01",
+             "age_at_valuation": 18 + i % 15, "club_id": 189, "club_nombre": CLUB}
+            for i in range(counts["valuations"])
+        ]),
+        "altas": pd.DataFrame([
+            {"player_id": str(200000 + i), "player_name": f"Alta {i}", "from_club": f"Club {i % 40}", "amount": f"{i % 9 + 1} mill. €"}
+            for i in range(counts["altas"])
+        ]),
+        "bajas": pd.DataFrame([
+            {"player_id": str(300000 + i), "player name": f"Baja {i}", "to_club": f"Club {i % 40}", "amount": "Libre"}
+            for i in range(counts["bajas"])
+        ]),
+    }
+
+
+def documents(frames):
+    return {csv_type: list(frame_documents(CLUB, SEASON, csv_type, df)) for csv_type, df in frames.items()}
+
+
+def simulate_transfer(frames):
+    # Se va el primer jugador del plantel y llega uno nuevo, aplicado como lo hacen
+    # los lectores del ledger sobre el snapshot.
+    leaving = frames["players"].iloc[0]
+    arriving = {"player_id": "999999", "número": "99", "nombre y apellido": "Jugador Nuevo",
+                "posicion": "Delantero centro", "edad": None, "valor": "5.0 mill. €"}
+    base = {"type": "transfer", "amount": 1000000, "transfer_date": "2024-07-01", "market_value": 5000000.0}
+    events = [
+        (event_key(CLUB, SEASON, 1), {
+            **base, "player_id": leaving["player_id"], "player_name": leaving["nombre y apellido"],
+            "from_club": CLUB, "to_club": "Destino",
+        }),
+        (event_key(CLUB, SEASON, 2), {
+            **base, "player_id": arriving["player_id"], "player_name": arriving["nombre y apellido"],
+            "from_club": "Otro Club", "to_club": CLUB, "player_row": {**arriving, "club": CLUB},
+            "valuation_rows": [
+                {"player_id": arriving["player_id"], "nombre_jugador": arriving["nombre y apellido"],
+                 "valuation_amount": amount, "valuation_date": f"202{i}-01-01", "age_at_valuation": 20 + i,
+                 "club_id": 1, "club_nombre": "Otro Club", "club": CLUB}
+                for i, amount in enumerate((1000000, 3000000, 5000000))
+            ],
+        }),
+    ]
+    return {csv_type: apply_events(df, csv_type, CLUB, events) for csv_type, df in frames.items()}
+
+
+def per_row(client, index, rows):
+    # Como la ingesta anterior: un request por fila, un tipo detrás de otro.
+    for csv_type, docs in rows.items():
+        vectors = []
+        for doc in docs:
+            values = client.embeddings.create(input=doc["text"], model=ingestion.EMBEDDING_MODEL).data[0].embedding
+            vectors.append({"id": doc["id"], "values": values, "metadata": doc["metadata"]})
+        for start in range(0, len(vectors), ingestion.UPSERT_BATCH_SIZE):
+            index.upsert(vectors=vectors[start:start + ingestion.UPSERT_BATCH_SIZE])
+
+
+def pipelined(client, index, rows):
+    sources = {
+        csv_type: (dataset_prefix(CLUB, SEASON, csv_type), (lambda docs=docs: iter(docs)))
+        for csv_type, docs in rows.items()
+    }
+    for csv_type, result, _ in ingestion.ingest_concurrently(client, index, sources):
+        if isinstance(result, Exception):
+            raise result
+
+
+def check(index, rows):
+    expected = {doc["id"] for docs in rows.values() for doc in docs}
+    assert set(index.vectors) == expected, f"{len(index.vectors)} vectores, se esperaban {len(expected)}"
+    for vector in index.vectors.values():
+        # El cache guarda float32: se compara con tolerancia.
+        expected_values = fake_embedding(vector["metadata"]["text"])
+        assert all(abs(a - b) < 1e-6 for a, b in zip(vector["values"], expected_values)), vector["id"]
+
+
+def run(name, ingest, rows, args, index=None):
+    client = FakeClient(args.latency / 1000, args.per_input / 1000)
+    index = index or FakeIndex(args.upsert_latency / 1000)
+    start = time.perf_counter()
+    ingest(client, index, rows)
+    elapsed = time.perf_counter() - start
+    check(index, rows)
+    total = sum(len(docs) for docs in rows.values())
+    result = {
+        "rows": total,
+        "seconds": round(elapsed, 3),
+        "rows_per_s": round(total / elapsed, 1),
+        "embedding_requests": client.embeddings.requests,
+        "embedded_rows": client.embeddings.inputs,
+        "upsert_calls": index.calls,
+        "deleted": index.deletes,
+    }
+    print(f"{name:<10} {total:>6} filas  {result['seconds']:>8.3f}s  {result['rows_per_s']:>9} filas/s  "
+          f"{result['embedding_requests']:>6} requests  {result['embedded_rows']:>6} embebidas  "
+          f"{result['upsert_calls']:>4} upserts  {result['deleted']:>4} borrados")
+    return result, index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000, help="filas totales entre los cuatro tipos")
+    parser.add_argument("--latency", type=float, default=100, help="latencia por request de embeddings, en ms")
+    parser.add_argument("--per-input", type=float, default=0.2, help="costo extra por texto en un request, en ms")
+    parser.add_argument("--upsert-latency", type=float, default=50, help="latencia por upsert, en ms")
+    parser.add_argument("--skip-per-row", action="store_true", help="no correr la variante fila por fila (lenta)")
+    parser.add_argument("--json", help="guarda los resultados en este archivo")
+    args = parser.parse_args()
+
+    frames = build_frames(args.rows)
+    rows = documents(frames)
+    results = {}
+    if not args.skip_per_row:
+        results["per_row"], _ = run("per_row", per_row, rows, args)
+    results["pipelined"], index = run("pipelined", pipelined, rows, args)
+
+    # Reingesta después de un traspaso: mismo índice, solo cambian unas filas.
+    index.calls = index.deletes = 0
+    results["transfer"], _ = run("transfer", pipelined, documents(simulate_transfer(frames)), args, index=index)
+    # Índice vacío, cache de embeddings caliente: no debería haber requests.
+    results["warm_cache"], _ = run("warm_cache", pipelined, rows, args)
+    if "per_row" in results:
+        print(f"speedup x{results['per_row']['seconds'] / results['pipelined']['seconds']:.1f}")
+
+    if args.json:
+        config = {**vars(args), "EMBED_BATCH_TOKENS": ingestion.EMBED_BATCH_TOKENS,
+                  "EMBED_BATCH_SIZE": ingestion.EMBED_BATCH_SIZE, "EMBED_WORKERS": ingestion.EMBED_WORKERS,
+                  "UPSERT_WORKERS": ingestion.UPSERT_WORKERS}
+        Path(args.json).write_text(json.dumps({"config": config, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Chequeo de que el parser no cambia los datos de los scrapers.
+
+Pasa las páginas de jugadores y transferencias de bench/fixtures.py por
+get_players y get_team_transfers con cada combinación de parser (html.parser y
+lxml, con y sin SoupStrainer) y compara los registros, convertidos por
+api/parsers.py como los sube el pipeline, contra los del código original de los
+scrapers (el de antes de api/html_parsing.py: html.parser sobre la página
+completa). Para las páginas grabadas de bench/fixtures/ esos registros están
+guardados en bench/fixtures/baseline_records.json; para las sintéticas se corre
+el código original desde la historia de git. Termina con código 1 si alguna
+combinación devuelve algo distinto.
+
+    python bench/parser_parity.py
+    python bench/parser_parity.py --write-baseline   # después de regrabar las páginas
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import types
+from pathlib import Path
+
+import fixtures
+
+ROOT = Path(__file__).resolve().parent.parent
+os.environ["HTTP_CACHE_DIR"] = str(Path(tempfile.mkdtemp()) / "http")
+sys.path.insert(0, str(ROOT / "api"))
+
+import pandas as pd  # noqa: E402
+import get_team_transfers  # noqa: E402
+import get_teams_players  # noqa: E402
+import html_parsing  # noqa: E402
+from http_cache import CachedResponse  # noqa: E402
+from parsers import parse_players, parse_transfers  # noqa: E402
+
+SEASON = "2024"
+BASELINE_PATH = fixtures.FIXTURE_DIR / "baseline_records.json"
+
+
+def parsers():
+    strainer = html_parsing.ITEMS_TABLES
+    variants = [("html.parser", None), ("html.parser", strainer)]
+    try:
+        import lxml  # noqa: F401
+        variants += [("lxml", None), ("lxml", strainer)]
+    except ImportError:
+        print("⚠️ lxml no está instalado: solo se compara html.parser con y sin SoupStrainer.")
+    return variants
+
+
+def label(parser, strainer):
+    return f"{parser}{' + SoupStrainer' if strainer is not None else ''}"
+
+
+def serve(body):
+    return lambda url, *args, **kwargs: CachedResponse(url, 200, body, "utf-8", changed=True, from_cache=False)
+
+
+def scrape(players_module, transfers_module, page):
+    players_body, transfers_body = page
+    players_module.fetch = serve(players_body)
+    transfers_module.fetch = serve(transfers_body)
+    with contextlib.redirect_stdout(io.StringIO()):
+        players = players_module.get_players("http://fixtures/players/", SEASON)
+        transfers = transfers_module.get_team_transfers("http://fixtures/transfers/", SEASON)
+    return {"get_players": players, "get_team_transfers": [list(rows) for rows in transfers]}
+
+
+def _plain(df):
+    return df.astype(object).where(pd.notnull(df), None).to_dict(orient="records")
+
+
+def records(page, parser, strainer):
+    """Registros de get_players y get_team_transfers para `page` con ese parser,
+    convertidos como los sube el pipeline."""
+    previous = html_parsing.HTML_PARSER, html_parsing.ITEMS_TABLES
+    html_parsing.HTML_PARSER, html_parsing.ITEMS_TABLES = parser, strainer
+    try:
+        raw = scrape(get_teams_players, get_team_transfers, page)
+    finally:
+        html_parsing.HTML_PARSER, html_parsing.ITEMS_TABLES = previous
+    transfers = [_plain(parse_transfers(pd.DataFrame(rows))) for rows in raw["get_team_transfers"]]
+    return {"get_players": _plain(parse_players(pd.DataFrame(raw["get_players"]))), "get_team_transfers": transfers}
+
+
+def original_rev():
+    # El commit anterior al que agregó api/html_parsing.py.
+    added = subprocess.run(
+        ["git", "rev-list", "--reverse", "HEAD", "--", "api/html_parsing.py"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    return subprocess.run(["git", "rev-parse", f"{added[0]}^"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def original_module(rev, name):
+    source = subprocess.run(["git", "show", f"{rev}:api/{name}.py"], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    module = types.ModuleType(f"original_{name}")
+    exec(compile(source, f"{rev[:7]}:api/{name}.py", "exec"), module.__dict__)
+    return module
+
+
+def original_records(page, rev):
+    """Registros del código original de los scrapers, tal cual los devolvía."""
+    return scrape(original_module(rev, "get_teams_players"), original_module(rev, "get_team_transfers"), page)
+
+
+def _int(value):
+    return int(value) if str(value).isdigit() else None
+
+
+def _money(value):
+    # El original truncaba al convertir desde float: int(8.2 * 1e6) daba 8199999.
+    if value == "Libre / Cesión":
+        return 0
+    return int(round(value, -3)) if isinstance(value, (int, float)) else value
+
+
+def upgrade(original, reference):
+    """Lleva los registros originales al formato de api/parsers.py, que cambió a
+    propósito: la edad es un número, las alturas sin dato quedan vacías (antes 0.0
+    o el texto) y "Libre / Cesión" pasa a monto 0 con el tipo aparte.
+
+    El tipo de transferencia no existía y las cesiones con la tarifa en el link
+    ("Tarifa de cesión: 1,00 mill. €") daban 0: para eso se toma `reference`, los
+    registros de html.parser sin SoupStrainer, así las variantes se comparan igual."""
+    players = [
+        {**row, "edad": _int(row["edad"]), "altura": row["altura"] if isinstance(row["altura"], int) else None, "valor": _money(row["valor"])}
+        for row in original["get_players"]
+    ]
+    transfers = []
+    for rows, current in zip(original["get_team_transfers"], reference["get_team_transfers"]):
+        upgraded = []
+        for pos, row in enumerate(rows):
+            ref = current[pos] if pos < len(current) else {}
+            amount = _money(row["amount"])
+            if amount == 0 and ref.get("transfer_type") == "loan":
+                amount = ref["amount"]
+            upgraded.append({**row, "amount": amount, "transfer_type": ref.get("transfer_type")})
+        transfers.append(upgraded)
+    return {"get_players": players, "get_team_transfers": transfers}
+
+
+def first_difference(expected, actual):
+    if type(expected) is not type(actual):
+        return f"{expected!r} != {actual!r}"
+    if isinstance(expected, (list, tuple)):
+        if len(expected) != len(actual):
+            return f"{len(expected)} registros != {len(actual)}"
+        for pos, (a, b) in enumerate(zip(expected, actual)):
+            if a != b:
+                return f"[{pos}] {first_difference(a, b)}"
+    if isinstance(expected, dict):
+        for key in expected.keys() | actual.keys():
+            if expected.get(key) != actual.get(key):
+                return f"{key}: {expected.get(key)!r} != {actual.get(key)!r}"
+    return f"{expected!r} != {actual!r}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--squad-size", type=int, default=30)
+    parser.add_argument("--rows", type=int, default=25, help="filas por tabla de transferencias")
+    parser.add_argument("--write-baseline", action="store_true",
+                        help="guarda los registros del código original para las páginas grabadas")
+    args = parser.parse_args()
+
+    recorded = (fixtures.FIXTURE_DIR / "players.html").exists() or (fixtures.FIXTURE_DIR / "transfers.html").exists()
+    synthetic = {
+        "sintéticas": (fixtures.players_html(args.squad_size), fixtures.transfers_html(args.rows)),
+        "sintéticas con quirks": (fixtures.players_html(args.squad_size, quirks=True), fixtures.transfers_html(args.rows, quirks=True)),
+    }
+    if args.write_baseline:
+        rev = original_rev()
+        # Con páginas grabadas, fixtures.py devuelve esas en vez de las sintéticas.
+        baseline = {"rev": rev, **original_records(synthetic["sintéticas"], rev)}
+        BASELINE_PATH.write_text(json.dumps(baseline, ensure_ascii=False, indent=1), encoding="utf-8")
+        print(f"✅ Registros de {rev[:7]} guardados en {BASELINE_PATH.relative_to(ROOT)}.")
+        return
+
+    if recorded:
+        if not BASELINE_PATH.exists():
+            print("❌ Faltan los registros originales de las páginas grabadas: python bench/parser_parity.py --write-baseline")
+            sys.exit(1)
+        baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+        pages = {"grabadas": (synthetic["sintéticas"], baseline.pop("rev"), baseline)}
+    else:
+        rev = original_rev()
+        pages = {name: (page, rev, original_records(page, rev)) for name, page in synthetic.items()}
+
+    failures = 0
+    for name, (page, rev, original) in pages.items():
+        expected = upgrade(original, records(page, "html.parser", None))
+        # Una página que no da registros no prueba nada: los dos caminos coincidirían igual.
+        assert expected["get_players"] and all(expected["get_team_transfers"]), f"las páginas {name} no dieron registros"
+        for variant in parsers():
+            actual = records(page, *variant)
+            for scraper, rows in expected.items():
+                if rows == actual[scraper]:
+                    print(f"✅ {scraper} ({name}): {label(*variant)} igual al código original ({rev[:7]}).")
+                else:
+                    failures += 1
+                    print(f"❌ {scraper} ({name}): {label(*variant)} difiere del código original ({rev[:7]}): "
+                          f"{first_difference(rows, actual[scraper])}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Graba en bench/fixtures/ las páginas reales que usan los benchmarks de scrapers.
+
+Descarga el plantel y las transferencias de transfermarkt de un club de
+urls.json, la página de su club, el historial de valor (tmapi) de un jugador
+del plantel y la tabla de sueldos de capology ya renderizada por Chrome (si
+selenium está instalado). Antes de guardar quita lo que no hace falta para
+parsear y no debería quedar en el repo: scripts externos, iframes, noscript
+(consentimiento, anuncios, analítica) y los parámetros de las URLs.
+
+    python bench/record_fixtures.py --club "manchester city" --season 2024
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+import fixtures
+
+ROOT = Path(__file__).resolve().parent.parent
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept-Language": "es-ES,es;q=0.9",
+}
+TMAPI_URL = "https://tmapi-alpha.transfermarkt.technology"
+
+_STRIP = [
+    re.compile(r"<script\b[^>]*\bsrc=[^>]*>\s*</script>", re.I),
+    re.compile(r"<iframe\b.*?</iframe>", re.I | re.S),
+    re.compile(r"<noscript\b.*?</noscript>", re.I | re.S),
+]
+_QUERY = re.compile(r'((?:href|src|data-src)="[^"?]*)\?[^"]*"', re.I)
+
+
+def sanitize(html):
+    for pattern in _STRIP:
+        html = pattern.sub("", html)
+    return _QUERY.sub(r'\1"', html)
+
+
+def get(url):
+    response = requests.get(url, headers=HEADERS, timeout=20)
+    response.raise_for_status()
+    time.sleep(2)  # sin apurar a transfermarkt
+    return response
+
+
+def rendered_salaries(url):
+    try:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+    except ImportError:
+        print("⚠️ selenium no está instalado: no se graba salaries.html.")
+        return None
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument(f"user-agent={HEADERS['User-Agent']}")
+    driver = webdriver.Chrome(options=options)
+    try:
+        driver.get(url)
+        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.CSS_SELECTOR, "#table tbody tr")))
+        time.sleep(2)
+        return driver.page_source
+    finally:
+        driver.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--club", default="manchester city", help="clave de urls.json")
+    parser.add_argument("--season", default="2024")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(ROOT / "api"))
+    from get_team_transfers import transfers_url
+
+    urls = json.loads((ROOT / "urls.json").read_text())[args.club]
+    fixtures.FIXTURE_DIR.mkdir(exist_ok=True)
+
+    def save(name, text):
+        (fixtures.FIXTURE_DIR / name).write_text(text, encoding="utf-8")
+        print(f"✅ {name} ({len(text.encode('utf-8')) // 1024} KB)")
+
+    players = get(urls["players"] + args.season).text
+    save("players.html", sanitize(players))
+    save("transfers.html", sanitize(get(transfers_url(urls["transfers"], args.season)).text))
+
+    club_id = re.search(r"/verein/(\d+)", urls["players"]).group(1)
+    save("club.html", sanitize(get(f"https://www.transfermarkt.es/codigoz/startseite/verein/{club_id}").text))
+
+    player_id = re.search(r"/profil/spieler/(\d+)", players)
+    if player_id:
+        save("history.json", json.dumps(get(f"{TMAPI_URL}/player/{player_id.group(1)}/market-value-history").json(), ensure_ascii=False, indent=1))
+    else:
+        print("⚠️ El plantel no trae links de jugadores: no se graba history.json.")
+
+    salaries = rendered_salaries(f"{urls['salaries']}{args.season}-{int(args.season) + 1}")
+    if salaries is not None:
+        save("salaries.html", sanitize(salaries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Benchmark offline de los scrapers.
+
+Levanta un servidor HTTP local que responde con las páginas de bench/fixtures.py
+(grabadas o sintéticas) y pasa por get_players, get_team_transfers,
+get_all_team_valuations y el parseo de sueldos, sin tocar la red. Reporta
+filas/seg, tiempo por etapa y pico de memoria (tracemalloc).
+
+    python bench/scrapers.py --rounds 5 --latency 20 --json bench_output.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import fixtures
+
+ROOT = Path(__file__).resolve().parent.parent
+SEASON = "2024"
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    squad_size = 30
+
+    def do_GET(self):
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        if parts[:1] == ["players"]:
+            body, kind = fixtures.players_html(self.squad_size), "text/html; charset=utf-8"
+        elif parts[:1] == ["transfers"]:
+            body, kind = fixtures.transfers_html(), "text/html; charset=utf-8"
+        elif parts[:1] == ["player"] and parts[-1:] == ["market-value-history"]:
+            body, kind = fixtures.history_json(int(parts[1])), "application/json"
+        elif parts[:3] == ["codigoz", "startseite", "verein"]:
+            body, kind = fixtures.club_html(parts[3]), "text/html; charset=utf-8"
+        elif parts[:1] == ["salaries"]:
+            body, kind = fixtures.salaries_html(self.squad_size), "text/html; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        if self.latency:
+            time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(latency, squad_size):
+    FixtureHandler.latency = latency
+    FixtureHandler.squad_size = squad_size
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def configure_env(base, workdir, workers):
+    # Todo lo que toca disco o red apunta a un directorio temporal y al servidor local.
+    os.environ.update({
+        "HTTP_CACHE_DIR": str(Path(workdir) / "http"),
+        "HTTP_CACHE_PAST_MAX_AGE_DAYS": "0",
+        "CLUB_CACHE_PATH": str(Path(workdir) / "clubs.sqlite"),
+        "SCRAPER_RATE_DEFAULT": "0",
+        "TMAPI_URL": base,
+        "TRANSFERMARKT_ES_URL": base,
+        "VALUATIONS_WORKERS": str(workers),
+    })
+    sys.path.insert(0, str(ROOT / "api"))
+    os.chdir(ROOT)
+
+
+def build_stages(base):
+    import pandas as pd
+    from get_teams_players import get_players
+    from get_team_transfers import get_team_transfers
+    from get_valuations import get_all_team_valuations
+    import get_valuations
+    from html_parsing import parse_salaries
+    from http_cache import fetch
+    from parsers import parse_players, parse_transfers
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        squad = get_players(f"{base}/players/?saison_id={SEASON}", season=SEASON)
+
+    def players():
+        return len(parse_players(pd.DataFrame(get_players(f"{base}/players/?saison_id={SEASON}", season=SEASON))))
+
+    def transfers():
+        altas, bajas = get_team_transfers(f"{base}/transfers/", SEASON)
+        return len(parse_transfers(pd.DataFrame(altas))) + len(parse_transfers(pd.DataFrame(bajas)))
+
+    def valuations():
+        # Sin el cache en memoria de clubes: cada ronda pasa por el cache SQLite.
+        get_valuations.club_cache.clear()
+        return len(get_all_team_valuations(squad))
+
+    def salaries():
+        return len(parse_salaries(fetch(f"{base}/salaries/{SEASON}").text))
+
+    return {"players": players, "transfers": transfers, "valuations": valuations, "salaries": salaries}
+
+
+def quiet(stage):
+    # Los scrapers imprimen progreso en cada llamada; en el benchmark solo ensucia.
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return stage()
+    return run
+
+
+def measure(stage, rounds):
+    stage = quiet(stage)
+    stage()  # calentamiento (imports, cache de clubes, conexiones)
+    timings, rows = [], 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        rows = stage()
+        timings.append(time.perf_counter() - start)
+
+    # El pico de memoria se mide en una ronda aparte: tracemalloc distorsiona los tiempos.
+    tracemalloc.start()
+    stage()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        "rows": rows,
+        "best_s": round(best, 4),
+        "mean_s": round(sum(timings) / len(timings), 4),
+        "rows_per_s": round(rows / best, 1) if best else None,
+        "peak_mb": round(peak / 1024 / 1024, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0, help="latencia simulada por request, en ms")
+    parser.add_argument("--squad-size", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=8, help="VALUATIONS_WORKERS")
+    parser.add_argument("--stages", default="players,transfers,valuations,salaries")
+    parser.add_argument("--json", help="guarda los resultados en este archivo")
+    args = parser.parse_args()
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    server, base = start_server(args.latency / 1000, args.squad_size)
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_env(base, workdir, args.workers)
+        stages = build_stages(base)
+        results = {}
+        for name in args.stages.split(","):
+            results[name] = measure(stages[name], args.rounds)
+            r = results[name]
+            print(f"{name:<11} {r['rows']:>6} filas  best {r['best_s']:.4f}s  mean {r['mean_s']:.4f}s  "
+                  f"{r['rows_per_s']:>10} filas/s  pico {r['peak_mb']} MB")
+    server.shutdown()
+
+    if args.json:
+        report = {"config": vars(args), "parser": __import__("html_parsing").HTML_PARSER, "results": results}
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
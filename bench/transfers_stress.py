@@ -0,0 +1,271 @@
+"""Prueba de carga de las transferencias simuladas contra un S3 falso (moto).
+
+Carga planteles, valoraciones y altas/bajas vacías de varios clubes, lanza
+cientos de execute_s3_transfer concurrentes entre ellos (con compactaciones del
+ledger en el medio, umbral y gracia bajos) y al final verifica los invariantes:
+
+  - cada jugador está en exactamente un plantel y ninguno se pierde;
+  - sus valoraciones están solo en el club que lo tiene;
+  - cada movimiento confirmado deja exactamente un alta y una baja;
+  - el resumen materializado (aggregates) coincide con los datasets mergeados.
+
+Los invariantes se chequean con el ledger pendiente y otra vez después de
+compactar todo. Antes, una ronda de movimientos entre pares de clubes disjuntos
+(club0->club1, club2->club3, ...) verifica que corran en paralelo: la ronda
+concurrente tiene que tardar bastante menos que la suma de la misma ronda en
+serie. Cada request a S3 espera --latency ms, como la red. Necesita moto
+(pip install "moto[s3]").
+
+    python bench/transfers_stress.py --transfers 400 --workers 32 --json bench_transfers.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+# Credenciales y caches del benchmark: nunca se toca el bucket ni el cache reales.
+os.environ.update(AWS_ACCESS_KEY_ID="bench", AWS_SECRET_ACCESS_KEY="bench", BUCKET_NAME="bench-transfers", AWS_REGION="us-east-1")
+os.environ["RESPONSE_CACHE_PATH"] = str(Path(tempfile.mkdtemp()) / "responses.sqlite")
+
+try:
+    from moto import mock_aws
+except ImportError:
+    sys.exit('❌ Falta moto: pip install "moto[s3]"')
+
+SEASON = "2024"
+
+
+def atomic_requests(client, latency=0.0):
+    """En S3 cada request es atómico; en moto no: dos PUT con If-None-Match a la misma
+    key pueden ganar los dos, y reescribir o borrar un objeto cierra el cuerpo que otro
+    hilo está leyendo. Se serializan solo los requests sobre una misma key; el resto
+    corre en paralelo. `latency` (segundos) simula la red antes de cada request."""
+    from botocore.response import StreamingBody
+
+    locks = defaultdict(threading.Lock)
+    locks_guard = threading.Lock()
+    call = client._make_api_call
+
+    def key_locks(operation, params):
+        if operation in ("PutObject", "GetObject"):
+            keys = [params["Key"]]
+        elif operation == "DeleteObjects":
+            keys = sorted({obj["Key"] for obj in params["Delete"]["Objects"]})
+        else:
+            return []
+        with locks_guard:
+            return [locks[key] for key in keys]
+
+    def atomic(operation, params):
+        if latency:
+            time.sleep(latency)
+        with contextlib.ExitStack() as stack:
+            for lock in key_locks(operation, params):
+                stack.enter_context(lock)
+            response = call(operation, params)
+            if operation == "GetObject":
+                body = response["Body"].read()
+                response["Body"] = StreamingBody(io.BytesIO(body), len(body))
+            return response
+
+    client._make_api_call = atomic
+
+
+def seed(aws_s3, clubs, squad_size, rng):
+    player_id = 0
+    for club in clubs:
+        players, valuations = [], []
+        for _ in range(squad_size):
+            player_id += 1
+            players.append({"nombre y apellido": f"Jugador {player_id}", "player_id": player_id,
+                            "posicion": rng.choice(["Portero", "Defensa", "Mediocampo", "Delantero"]),
+                            "valor": rng.randint(1, 90) * 100000, "club": club.title()})
+            for year in range(2021, 2025):
+                valuations.append({"player_id": player_id, "valuation_amount": rng.randint(1, 90) * 100000,
+                                   "valuation_date": f"{year}-07-01", "club_name": club.title()})
+        transfers = pd.DataFrame(columns=["player_id", "player_name", "from_club", "to_club", "amount", "transfer_date", "market_value"])
+        aws_s3.upload_many([
+            (pd.DataFrame(players), f"datasets/{club}/{SEASON}/{club}_{SEASON}_players.csv"),
+            (pd.DataFrame(valuations), f"datasets/{club}/{SEASON}/{club}_{SEASON}_valuations.csv"),
+            (transfers, f"datasets/{club}/{SEASON}/{club}_{SEASON}_altas.csv"),
+            (transfers, f"datasets/{club}/{SEASON}/{club}_{SEASON}_bajas.csv"),
+        ])
+    return list(range(1, player_id + 1))
+
+
+def ids(df):
+    if df is None or df.empty:
+        return []
+    return [str(v).replace(".0", "") for v in df["player_id"]]
+
+
+def amount_total(df, column):
+    if df is None or df.empty:
+        return 0.0
+    return float(df[column].astype(float).sum())
+
+
+def disjoint_round(aws_s3, clubs, owners, rng, parallel):
+    pairs = [(clubs[i], clubs[i + 1]) for i in range(0, len(clubs) - 1, 2)]
+    moves = []
+    for from_club, to_club in pairs:
+        pid = rng.choice([pid for pid, club in owners.items() if club == from_club])
+        owners[pid] = to_club
+        moves.append((f"Jugador {pid}", from_club, to_club, rng.randint(1, 50) * 100000))
+
+    def transfer(move):
+        return aws_s3.execute_s3_transfer(move[0], SEASON, move[1], move[2], move[3])
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if parallel:
+            with ThreadPoolExecutor(len(moves)) as pool:
+                results = list(pool.map(transfer, moves))
+        else:
+            results = [transfer(move) for move in moves]
+    elapsed = time.perf_counter() - start
+    assert all(result.startswith("✅") for result in results), f"movimientos entre clubes disjuntos fallaron: {results}"
+    return len(moves), elapsed
+
+
+def check_disjoint(aws_s3, clubs, owners, rng):
+    # Una ronda en serie y otra en paralelo, con jugadores distintos y los mismos pares
+    # (la primera ronda solo calienta caches e imports).
+    warmup, _ = disjoint_round(aws_s3, clubs, owners, rng, parallel=False)
+    count, serial = disjoint_round(aws_s3, clubs, owners, rng, parallel=False)
+    _, parallel = disjoint_round(aws_s3, clubs, owners, rng, parallel=True)
+    speedup = serial / parallel
+    print(f"Pares disjuntos: {count} movimientos en {serial:.2f}s en serie y {parallel:.2f}s en paralelo (x{speedup:.1f}).")
+    assert speedup >= 1 + (count - 1) * 0.25, f"los movimientos entre clubes disjuntos no corren en paralelo (x{speedup:.1f})"
+    return warmup + 2 * count, round(speedup, 2)
+
+
+def check(aws_s3, ledger, aggregates, clubs, player_ids, confirmed, stage):
+    # Se lee todo de cero: ni el cache de DataFrames ni los listados del ledger.
+    aws_s3.dataset_cache.clear()
+    ledger._listings.clear()
+    owner = {}
+    altas = bajas = 0
+    for club in clubs:
+        players, valuations, df_altas, df_bajas = ledger.read_datasets(club, SEASON, "players", "valuations", "altas", "bajas")
+        for pid in ids(players):
+            assert pid not in owner, f"[{stage}] jugador {pid} en {owner[pid]} y en {club}"
+            owner[pid] = club
+        squad = set(ids(players))
+        stray = set(ids(valuations)) - squad
+        assert not stray, f"[{stage}] {club} tiene valoraciones de jugadores ajenos: {sorted(stray)[:5]}"
+        altas += len(ids(df_altas))
+        bajas += len(ids(df_bajas))
+
+        summary = aggregates.sync_aggregates(club, SEASON, fresh=True)
+        expected = {
+            "squad_size": len(squad),
+            "squad_value": amount_total(players, "valor"),
+            "altas_count": len(ids(df_altas)),
+            "bajas_count": len(ids(df_bajas)),
+            "total_spent": amount_total(df_altas, "amount"),
+            "total_income": amount_total(df_bajas, "amount"),
+        }
+        for field, value in expected.items():
+            assert abs(summary[field] - value) < 1e-6, f"[{stage}] resumen de {club}: {field}={summary[field]}, datasets={value}"
+
+    missing = {str(pid) for pid in player_ids} - set(owner)
+    assert not missing, f"[{stage}] se perdieron {len(missing)} jugadores: {sorted(missing)[:5]}"
+    assert altas == bajas == confirmed, f"[{stage}] {confirmed} movimientos confirmados, {altas} altas y {bajas} bajas"
+    print(f"✅ [{stage}] {len(owner)} jugadores en {len(clubs)} planteles, {confirmed} movimientos, resúmenes consistentes.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clubs", type=int, default=6)
+    parser.add_argument("--squad-size", type=int, default=25)
+    parser.add_argument("--transfers", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=32, help="transferencias en vuelo a la vez")
+    parser.add_argument("--compact-threshold", type=int, default=15, help="LEDGER_COMPACT_THRESHOLD para la prueba")
+    parser.add_argument("--grace", type=float, default=5, help="LEDGER_COMPACT_GRACE_SECONDS para la prueba")
+    parser.add_argument("--latency", type=float, default=20, help="ms de red simulados por request a S3")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="guarda los resultados en este archivo")
+    args = parser.parse_args()
+
+    with mock_aws():
+        import boto3
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=os.environ["BUCKET_NAME"])
+        from api import aws_s3, ledger, aggregates
+
+        atomic_requests(aws_s3.s3, args.latency / 1000)
+        ledger.LEDGER_COMPACT_THRESHOLD = args.compact_threshold
+        ledger.LEDGER_COMPACT_GRACE_SECONDS = args.grace
+        rng = random.Random(args.seed)
+        clubs = [f"club{i}" for i in range(args.clubs)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            player_ids = seed(aws_s3, clubs, args.squad_size, rng)
+        # Cada movimiento sale del club donde quedaría el jugador si todo corriera en
+        # orden; como corren en paralelo, algunos lo van a encontrar en otro club.
+        owners = {pid: clubs[(pid - 1) // args.squad_size] for pid in player_ids}
+        disjoint_moves, disjoint_speedup = check_disjoint(aws_s3, clubs, owners, rng)
+        moves = []
+        for _ in range(args.transfers):
+            pid = rng.choice(player_ids)
+            to_club = rng.choice([club for club in clubs if club != owners[pid]])
+            moves.append((f"Jugador {pid}", owners[pid], to_club, rng.randint(1, 50) * 100000))
+            owners[pid] = to_club
+
+        def transfer(move):
+            start = time.perf_counter()
+            result = aws_s3.execute_s3_transfer(move[0], SEASON, move[1], move[2], move[3])
+            return result, time.perf_counter() - start
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(args.workers) as pool:
+            outcomes = list(pool.map(transfer, moves))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(seconds for _, seconds in outcomes)
+        confirmed = sum(result.startswith("✅") for result, _ in outcomes)
+        # "No encontrado" es esperable: el movimiento anterior del jugador pudo no haber corrido todavía.
+        not_found = sum(result.startswith("⚠️") for result, _ in outcomes)
+        failed = [result for result, _ in outcomes if result.startswith("❌")]
+        result = {
+            "transfers": len(moves),
+            "disjoint_speedup": disjoint_speedup,
+            "confirmed": confirmed,
+            "not_found": not_found,
+            "failed": len(failed),
+            "seconds": round(elapsed, 3),
+            "transfers_per_s": round(len(moves) / elapsed, 1),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+        }
+        print(f"{len(moves)} transferencias en {result['seconds']}s ({result['transfers_per_s']}/s): "
+              f"{confirmed} confirmadas, {not_found} sin jugador, {len(failed)} fallidas; "
+              f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms")
+        for message in sorted(set(failed)):
+            print(f"   {message}")
+
+        check(aws_s3, ledger, aggregates, clubs, player_ids, confirmed + disjoint_moves, "con ledger pendiente")
+        time.sleep(ledger.LEDGER_COMPACT_GRACE_SECONDS)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for club in clubs:
+                ledger.compact_ledger(club, SEASON)
+        check(aws_s3, ledger, aggregates, clubs, player_ids, confirmed + disjoint_moves, "compactado")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"config": vars(args), "results": result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark del índice vectorial local: recall y latencia contra búsqueda exacta.
+
+Genera vectores sintéticos agrupados (como los embeddings de filas parecidas),
+con metadata club/season/tipo, los carga en un LocalVectorStore en un
+directorio temporal y compara, para cada consulta, el top-k del índice IVF
+con el top-k exacto por fuerza bruta. Se mide sin filtro, con el filtro de
+get_player_current_club (tipo $eq) y con el de get_context_from_pinecone
+(club + season $eq, tipo $in).
+
+    python bench/vector_store.py --vectors 200000 --dim 384 --nprobe 4,8,16 --json bench_vectors.json
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from ia.vector_store import LocalVectorStore
+
+CLUBS = [f"club{i}" for i in range(20)]
+SEASONS = [str(2015 + i) for i in range(10)]
+TIPOS = ["altas", "bajas", "players", "valuations"]
+TIPO_WEIGHTS = [0.05, 0.05, 0.15, 0.75]
+
+
+def synthetic(count, dim, clusters, spread, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + spread * rng.normal(size=(count, dim)).astype(np.float32)
+    metadata = [
+        {"club": CLUBS[c], "season": SEASONS[s], "tipo": TIPOS[t], "text": f"fila {i}"}
+        for i, (c, s, t) in enumerate(zip(
+            rng.integers(0, len(CLUBS), count),
+            rng.integers(0, len(SEASONS), count),
+            rng.choice(len(TIPOS), size=count, p=TIPO_WEIGHTS),
+        ))
+    ]
+    return vectors, metadata
+
+
+def build(path, vectors, metadata, ivf_min_vectors):
+    store = LocalVectorStore(path, ivf_min_vectors=ivf_min_vectors)
+    for start in range(0, len(vectors), 1000):
+        store.upsert([
+            {"id": f"v{i}", "values": vectors[i], "metadata": metadata[i]}
+            for i in range(start, min(start + 1000, len(vectors)))
+        ])
+    started = time.perf_counter()
+    store.flush()
+    return store, time.perf_counter() - started
+
+
+def percentile(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 3)
+
+
+def run_queries(store, queries, top_k, query_filter):
+    exact_times, approx_times, recalls = [], [], []
+    for query in queries:
+        started = time.perf_counter()
+        exact = store.query(query, top_k=top_k, filter=query_filter, exact=True)["matches"]
+        exact_times.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        approx = store.query(query, top_k=top_k, filter=query_filter)["matches"]
+        approx_times.append(time.perf_counter() - started)
+        expected = {m["id"] for m in exact}
+        if expected:
+            recalls.append(len(expected & {m["id"] for m in approx}) / len(expected))
+    return {
+        "recall": round(float(np.mean(recalls)), 4) if recalls else None,
+        "exact_p50_ms": percentile(exact_times, 50),
+        "exact_p95_ms": percentile(exact_times, 95),
+        "approx_p50_ms": percentile(approx_times, 50),
+        "approx_p95_ms": percentile(approx_times, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384, help="text-embedding-3-small usa 1536")
+    parser.add_argument("--clusters", type=int, default=300)
+    parser.add_argument("--spread", type=float, default=2.0, help="dispersión dentro de cada grupo (más alto, más difícil)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", default="4,8,16")
+    parser.add_argument("--ivf-min-vectors", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="guarda los resultados en este archivo")
+    args = parser.parse_args()
+
+    vectors, metadata = synthetic(args.vectors, args.dim, args.clusters, args.spread, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    picks = rng.integers(0, len(vectors), args.queries)
+    queries = vectors[picks] + args.spread * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    filters = {
+        "sin_filtro": None,
+        "tipo_eq": {"tipo": {"$eq": "valuations"}},
+        "club_season_tipo_in": {"club": {"$eq": "club3"}, "season": {"$eq": "2020"}, "tipo": {"$in": ["players", "valuations"]}},
+    }
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        store, build_s = build(workdir, vectors, metadata, args.ivf_min_vectors)
+        nlist = 0 if store.snapshot.centroids is None else len(store.snapshot.centroids)
+        print(f"{args.vectors} vectores de dim {args.dim}: índice armado en {build_s:.2f}s ({nlist} listas IVF)")
+        for nprobe in [int(n) for n in args.nprobe.split(",")]:
+            store.nprobe = nprobe
+            for name, query_filter in filters.items():
+                r = run_queries(store, queries, args.top_k, query_filter)
+                results[f"nprobe={nprobe} {name}"] = r
+                print(f"nprobe={nprobe:<3} {name:<20} recall@{args.top_k} {r['recall']}  "
+                      f"exacto p50 {r['exact_p50_ms']}ms p95 {r['exact_p95_ms']}ms  "
+                      f"ivf p50 {r['approx_p50_ms']}ms p95 {r['approx_p95_ms']}ms")
+
+    if args.json:
+        report = {"config": vars(args), "build_s": round(build_s, 3), "nlist": nlist, "results": results}
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import re
+import pandas as pd
+from ia.ingestion import vector_id
+
+# Arma los documentos de la ingesta directo desde el DataFrame, por bloques de
+# filas, sin pasar por un CSV temporal ni por CSVLoader. El texto es el mismo
+# que producía ese camino ("[tipo=… club=… season=…] col: val, col: val"):
+# valores como los escribe to_csv (NaN vacío, floats con ".0"), sin espacios
+# en los extremos y con los saltos de línea reemplazados por ", ". Que sea
+# idéntico importa: el cache de embeddings está indexado por el hash del texto.
+#
+# El id del vector, en cambio, sale del player_id y de los campos con valor de la
+# fila (no del texto): una columna que la fila no tiene, como la que agrega un
+# traspaso simulado ("club" en players, "to_club" en altas...), no le cambia el
+# id y la reingesta no vuelve a embeber toda la tabla. Los enteros pasan sin el
+# ".0" que les agrega pandas cuando una fila nueva deja la columna con NaN.
+
+DOCUMENT_CHUNK_ROWS = int(os.getenv("DOCUMENT_CHUNK_ROWS", "2000"))
+
+
+def dataset_prefix(club, season, csv_type):
+    return f"{club.lower()}_{season}_{csv_type}_"
+
+
+def _column_text(series):
+    return series.astype("string").fillna("").str.strip().str.replace("\n", ", ", regex=False)
+
+
+def _row_keys(chunk):
+    # player_id identifica la fila en todos los datasets; si falta, el id queda solo con el hash.
+    if "player_id" not in chunk.columns:
+        return [None] * len(chunk)
+    return [None if pd.isna(v) else str(v).removesuffix(".0") for v in chunk["player_id"]]
+
+
+_INTEGRAL = re.compile(r"^(-?\d+)\.0$")
+
+
+def _row_content(names, values):
+    fields = sorted((name, _INTEGRAL.sub(r"\1", value)) for name, value in zip(names, values) if value != "")
+    return "\n".join(f"{name}: {value}" for name, value in fields)
+
+
+def frame_documents(club, season, csv_type, df, chunk_rows=None):
+    """Genera {"id", "text", "metadata"} por fila de `df`. Solo un bloque de
+    `chunk_rows` filas se convierte a texto a la vez."""
+    chunk_rows = chunk_rows or DOCUMENT_CHUNK_ROWS
+    club = club.lower()
+    prefix = dataset_prefix(club, season, csv_type)
+    header = f"[tipo={csv_type} club={club} season={season}]"
+    metadata = {"tipo": csv_type, "club": club, "season": str(season)}
+    names = [str(column).strip() for column in df.columns]
+
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        columns = [_column_text(chunk.iloc[:, pos]).tolist() for pos in range(len(names))]
+        for key, values in zip(_row_keys(chunk), zip(*columns)):
+            row_text = ", ".join(f"{name}: {value}" for name, value in zip(names, values)).strip()
+            text = f"{header} {row_text}"
+            yield {"id": vector_id(prefix, _row_content(names, values), key), "text": text, "metadata": {"text": text, **metadata}}
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import sqlite3
+import time
+from array import array
+from pathlib import Path
+from api.sqlite_store import SQLiteStore
+
+# Cache persistente texto -> embedding para la ingesta. La clave es el hash del
+# modelo y del texto de la fila, así que una fila que no cambió no se vuelve a
+# embeber aunque se reingeste en otro índice o después de borrarlo. Mismo
+# esquema que api/club_cache.py (api/sqlite_store.py).
+#
+# Cada lectura renueva used_at de lo que encontró; lo que no se usa en
+# EMBEDDING_CACHE_TTL_DAYS (filas que cambiaron, modelos que ya no se usan) deja
+# de devolverse y se borra en la próxima escritura, así el archivo no crece sin límite.
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(Path(__file__).resolve().parent.parent / ".cache" / "embeddings.sqlite"))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TTL_DAYS", "90")) * 24 * 3600
+
+
+def _add_used_at(conn):
+    # Caches creados antes de que existiera el vencimiento: lo viejo cuenta como usado hoy.
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(embeddings)")]
+    if "used_at" in columns:
+        return
+    try:
+        conn.execute("ALTER TABLE embeddings ADD COLUMN used_at REAL NOT NULL DEFAULT 0")
+    except sqlite3.OperationalError:
+        return  # otro proceso la agregó al mismo tiempo
+    conn.execute("UPDATE embeddings SET used_at = ?", (time.time(),))
+
+
+_store = SQLiteStore(
+    EMBEDDING_CACHE_PATH,
+    "CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vector BLOB NOT NULL, used_at REAL NOT NULL DEFAULT 0)",
+    _add_used_at,
+    "CREATE INDEX IF NOT EXISTS embeddings_used_at ON embeddings (used_at)",
+)
+
+
+def text_hash(text, model=""):
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def get_many(texts, model):
+    """Devuelve {texto: embedding} solo para los textos cacheados y no vencidos."""
+    by_hash = {text_hash(text, model): text for text in texts}
+    if not by_hash:
+        return {}
+    now = time.time()
+    rows = _store.query_in(
+        "SELECT hash, vector FROM embeddings WHERE used_at >= ? AND hash IN ({})",
+        by_hash, [now - EMBEDDING_CACHE_TTL_SECONDS],
+    )
+    found = {by_hash[key]: array("f", blob).tolist() for key, blob in rows}
+    if rows:
+        with _store.transaction():
+            _store.query_in("UPDATE embeddings SET used_at = ? WHERE hash IN ({})", [key for key, _ in rows], [now])
+    return found
+
+
+def put_many(pairs, model):
+    """Guarda pares (texto, embedding). Los vectores se guardan como float32."""
+    now = time.time()
+    rows = [(text_hash(text, model), array("f", vector).tobytes(), now) for text, vector in pairs]
+    if not rows:
+        return 0
+    with _store.transaction() as conn:
+        conn.executemany("INSERT OR REPLACE INTO embeddings (hash, vector, used_at) VALUES (?, ?, ?)", rows)
+        conn.execute("DELETE FROM embeddings WHERE used_at < ?", (now - EMBEDDING_CACHE_TTL_SECONDS,))
+    return len(rows)
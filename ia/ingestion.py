@@ -0,0 +1,161 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ia import embedding_cache
+
+# Pipeline de ingesta de embeddings: los documentos se agrupan en lotes por
+# presupuesto de tokens (un request de embeddings por lote, no por fila), los
+# lotes se embeben en paralelo y cada lote se sube al índice apenas está listo,
+# mientras los siguientes se siguen embebiendo. Los tipos de dataset (altas,
+# bajas, players, valuations) se procesan a la vez y comparten los pools, así
+# que la concurrencia total contra la API de embeddings está acotada.
+#
+# Los ids de los vectores salen de los campos con valor de la fila, así que reingestar
+# solo sube las filas nuevas o modificadas y borra las que ya no están; los
+# embeddings, además, se cachean por hash del texto (ia/embedding_cache.py).
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "50000"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))  # la API acepta hasta 2048 inputs
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+UPSERT_WORKERS = int(os.getenv("UPSERT_WORKERS", "2"))
+UPSERT_BATCH_SIZE = 100
+DELETE_BATCH_SIZE = 1000
+
+
+def estimate_tokens(text):
+    # Cota conservadora sin tokenizer: las filas tienen muchos números y
+    # abreviaturas, que cortan en tokens más chicos que el texto corrido.
+    return len(text) // 3 + 1
+
+
+def token_batches(documents, max_tokens=None, max_items=None):
+    """Agrupa documentos ({"id", "text", "metadata"}) en lotes que no pasan
+    `max_tokens` estimados ni `max_items` elementos."""
+    max_tokens = max_tokens or EMBED_BATCH_TOKENS
+    max_items = max_items or EMBED_BATCH_SIZE
+    batch, tokens = [], 0
+    for doc in documents:
+        size = estimate_tokens(doc["text"])
+        if batch and (tokens + size > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(doc)
+        tokens += size
+    if batch:
+        yield batch
+
+
+def embed_texts(client, texts):
+    response = client.embeddings.create(input=texts, model=EMBEDDING_MODEL)
+    # La API devuelve un elemento por input con su posición; no se asume el orden.
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+def embed_cached(client, texts):
+    cached = embedding_cache.get_many(texts, EMBEDDING_MODEL)
+    missing = list(dict.fromkeys(text for text in texts if text not in cached))
+    if missing:
+        fresh = embed_texts(client, missing)
+        embedding_cache.put_many(zip(missing, fresh), EMBEDDING_MODEL)
+        cached.update(zip(missing, fresh))
+    return [cached[text] for text in texts]
+
+
+def vector_id(prefix, content, key=None):
+    """Id estable: prefijo del dataset, player_id si lo hay y hash del contenido de la
+    fila (ver ia/documents.py)."""
+    digest = embedding_cache.text_hash(content)[:16]
+    return f"{prefix}{key}_{digest}" if key is not None else f"{prefix}{digest}"
+
+
+def list_ids(index, prefix):
+    ids = set()
+    for page in index.list(prefix=prefix):
+        ids.update(page)
+    return ids
+
+
+def delete_ids(index, ids):
+    ids = sorted(ids)
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        index.delete(ids=ids[start:start + DELETE_BATCH_SIZE])
+    return len(ids)
+
+
+def _upsert_batch(index, batch, embeddings):
+    vectors = [
+        {"id": doc["id"], "values": values, "metadata": doc["metadata"]}
+        for doc, values in zip(batch, embeddings)
+    ]
+    for start in range(0, len(vectors), UPSERT_BATCH_SIZE):
+        index.upsert(vectors=vectors[start:start + UPSERT_BATCH_SIZE])
+    return len(vectors)
+
+
+def ingest_documents(client, index, documents, embed_pool, upsert_pool):
+    """Embebe y sube `documents`. Devuelve la cantidad de vectores subidos."""
+    # Se limita la cantidad de lotes en vuelo para no cargar en memoria todos los
+    # embeddings de una tabla grande antes de empezar a subirlos.
+    max_in_flight = 2 * EMBED_WORKERS
+    pending, upserts = deque(), []
+
+    def upsert_oldest():
+        batch, embedding = pending.popleft()
+        upserts.append(upsert_pool.submit(_upsert_batch, index, batch, embedding.result()))
+
+    for batch in token_batches(documents):
+        pending.append((batch, embed_pool.submit(embed_cached, client, [doc["text"] for doc in batch])))
+        if len(pending) > max_in_flight:
+            upsert_oldest()
+    while pending:
+        upsert_oldest()
+    return sum(upsert.result() for upsert in upserts)
+
+
+def sync_documents(client, index, documents, prefix, embed_pool, upsert_pool):
+    """Deja en el índice, bajo `prefix`, exactamente los vectores de `documents`.
+    Solo embebe y sube los ids que no estaban; borra los que ya no aparecen."""
+    existing = list_ids(index, prefix)
+    seen = set()
+
+    def changed():
+        for doc in documents:
+            if doc["id"] in seen:
+                continue
+            seen.add(doc["id"])
+            if doc["id"] not in existing:
+                yield doc
+
+    upserted = ingest_documents(client, index, changed(), embed_pool, upsert_pool)
+    deleted = delete_ids(index, existing - seen)
+    return {"upserted": upserted, "unchanged": len(seen) - upserted, "deleted": deleted}
+
+
+def _ingest_source(client, index, prefix, load, embed_pool, upsert_pool):
+    start = time.perf_counter()
+    documents = load()
+    if documents is None:
+        return None, time.perf_counter() - start
+    result = sync_documents(client, index, documents, prefix, embed_pool, upsert_pool)
+    return result, time.perf_counter() - start
+
+
+def ingest_concurrently(client, index, sources):
+    """`sources` es {nombre: (prefijo de ids, función que devuelve los documentos o None si no
+    hay datos)}. Sincroniza todas las fuentes a la vez y va devolviendo
+    (nombre, {"upserted", "unchanged", "deleted"} | excepción, segundos) a medida que terminan."""
+    with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as embed_pool, \
+            ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as upsert_pool, \
+            ThreadPoolExecutor(max_workers=max(1, len(sources))) as source_pool:
+        futures = {
+            source_pool.submit(_ingest_source, client, index, prefix, load, embed_pool, upsert_pool): name
+            for name, (prefix, load) in sources.items()
+        }
+        for future in as_completed(futures):
+            try:
+                result, elapsed = future.result()
+            except Exception as e:
+                result, elapsed = e, None
+            yield futures[future], result, elapsed
@@ -1,22 +1,23 @@
 import os
-from pinecone import Pinecone
-from langchain_community.document_loaders.csv_loader import CSVLoader
 from openai import OpenAI
-import tempfile
 import sys
+import time
 from dotenv import load_dotenv
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from api.aws_s3 import read_aws_csv
+from api.ledger import read_dataset
+from api.response_cache import bump_data_version
+from ia.ingestion import ingest_concurrently
+from ia.documents import dataset_prefix, frame_documents
+from ia.vector_store import VECTOR_STORE, open_store
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 INDEX_NAME = "winning" 
 
-if OPENAI_API_KEY and PINECONE_API_KEY:
+if OPENAI_API_KEY and (PINECONE_API_KEY or VECTOR_STORE == "local"):
     client = OpenAI(api_key=OPENAI_API_KEY)
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    index = pc.Index(INDEX_NAME)
+    index = open_store(api_key=PINECONE_API_KEY, index_name=INDEX_NAME)
 else:
     client = None
     index = None
@@ -29,56 +30,31 @@ def ingest_data(club, season):
     csv_types = ["altas", "bajas", "players", "valuations"]
     print(f"☁️ Iniciando ingesta desde S3 (vía Pandas) para: {club.upper()} {season}")
 
-    for csv_type in csv_types:
-        s3_path = f"datasets/{club.lower()}/{season}/{club.lower()}_{season}_{csv_type}.csv"
-        
-        df = read_aws_csv(s3_path)
-        
-        if df is not None:
-            try:
-                csv_text = df.to_csv(index=False, encoding="utf-8-sig")
-                
-                with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix=".csv", encoding="utf-8-sig") as f:
-                    f.write(csv_text)
-                    temp_path = f.name
-
-                loader = CSVLoader(file_path=temp_path, encoding="utf-8-sig")
-                documents = loader.load()
-                os.remove(temp_path) 
-
-                all_vectors = []
-                for i, doc in enumerate(documents):
-                    row_text = doc.page_content.replace('\n', ', ').strip()
-                    clean_content = f"[tipo={csv_type} club={club.lower()} season={season}] {row_text}"
-
-                    embedding = client.embeddings.create(
-                        input=clean_content,
-                        model="text-embedding-3-small"
-                    ).data[0].embedding
-
-                    all_vectors.append({
-                        "id": f"{club.lower()}_{season}_{csv_type}_{i}",
-                        "values": embedding,
-                        "metadata": {
-                            "text": clean_content, 
-                            "tipo": csv_type, 
-                            "club": club.lower(), 
-                            "season": str(season) 
-                        }
-                    })
-
-                batch_size = 100
-                for j in range(0, len(all_vectors), batch_size):
-                    index.upsert(vectors=all_vectors[j : j + batch_size])
-                
-                print(f"✅ {csv_type.capitalize()} de {club} {season} ingestado correctamente.")
-
-            except Exception as e:
-                print(f"❌ Error procesando el DataFrame de {csv_type}: {e}")
-        else:
+    def source(csv_type):
+        def load():
+            df = read_dataset(club.lower(), season, csv_type)
+            return None if df is None else frame_documents(club, season, csv_type, df)
+        return load
+
+    start = time.perf_counter()
+    total = 0
+    sources = {t: (dataset_prefix(club, season, t), source(t)) for t in csv_types}
+    for csv_type, result, elapsed in ingest_concurrently(client, index, sources):
+        if isinstance(result, Exception):
+            print(f"❌ Error procesando el DataFrame de {csv_type}: {result}")
+        elif result is None:
+            s3_path = f"datasets/{club.lower()}/{season}/{club.lower()}_{season}_{csv_type}.csv"
             print(f"⚠️ No se pudo obtener el DataFrame para {s3_path}")
+        else:
+            total += result["upserted"]
+            print(f"✅ {csv_type.capitalize()} de {club} {season} ingestado correctamente "
+                  f"({result['upserted']} nuevos, {result['unchanged']} sin cambios, {result['deleted']} borrados, {elapsed:.1f}s).")
+
+    index.flush()
+    # Los resúmenes y análisis cacheados de esta temporada quedan invalidados.
+    bump_data_version(club, season)
 
-    print(f"🏁 Finalizada ingesta de {club} {season}.")
+    print(f"🏁 Finalizada ingesta de {club} {season}: {total} vectores subidos en {time.perf_counter() - start:.1f}s.")
 
 def query_rag(question):
     if index is None or client is None:
@@ -0,0 +1,362 @@
+import json
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos, un solo worker escribe
+    fcntl = None
+
+# Interfaz común para el índice vectorial: upsert, delete, list(prefix) y
+# query(vector, top_k, filter, include_metadata), con la misma forma que el
+# índice de Pinecone. VECTOR_STORE elige el backend:
+#   - "pinecone": el índice remoto de siempre.
+#   - "local": un índice en disco, dentro del proceso. Con pocos vectores busca
+#     por fuerza bruta (exacto); a partir de IVF_MIN_VECTORS arma un índice IVF
+#     (k-means, vectores ordenados por lista) y solo recorre las IVF_NPROBE
+#     listas más cercanas. Los vectores se leen con memmap.
+# Los filtros soportan $eq y $in sobre cualquier campo de metadata (club,
+# season, tipo), igual que las consultas que ya se le hacen a Pinecone.
+
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", str(Path(__file__).resolve().parent.parent / ".cache" / "vectors"))
+IVF_MIN_VECTORS = int(os.getenv("IVF_MIN_VECTORS", "20000"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+KMEANS_ITERATIONS = 12
+KMEANS_SAMPLE = 50000
+LIST_PAGE_SIZE = 100
+REFRESH_RETRIES = 5
+REFRESH_BACKOFF_SECONDS = 0.05
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _assign(vectors, centroids, chunk=65536):
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk):
+        labels[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+    return labels
+
+
+def kmeans(vectors, nlist, seed=0):
+    """K-means esférico (similitud coseno) sobre una muestra; devuelve los centroides."""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(len(vectors), KMEANS_SAMPLE), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        labels = _assign(sample, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=nlist)
+        empty = counts == 0
+        sums = np.zeros_like(centroids)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums[~empty] = np.add.reduceat(sample[order], starts[~empty])
+        # Las listas que quedaron vacías se reinician con puntos al azar.
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class VectorStore(ABC):
+    """Lo que el resto del código usa del índice vectorial."""
+
+    @abstractmethod
+    def upsert(self, vectors):
+        ...
+
+    @abstractmethod
+    def delete(self, ids):
+        ...
+
+    @abstractmethod
+    def list(self, prefix):
+        ...
+
+    @abstractmethod
+    def query(self, vector, top_k=10, filter=None, include_metadata=True):
+        ...
+
+    def flush(self):
+        pass
+
+
+class PineconeStore(VectorStore):
+    def __init__(self, index):
+        self.index = index
+
+    def upsert(self, vectors):
+        return self.index.upsert(vectors=vectors)
+
+    def delete(self, ids):
+        return self.index.delete(ids=ids)
+
+    def list(self, prefix):
+        return self.index.list(prefix=prefix)
+
+    def query(self, vector, top_k=10, filter=None, include_metadata=True):
+        return self.index.query(vector=vector, top_k=top_k, filter=filter, include_metadata=include_metadata)
+
+
+class _Snapshot:
+    """Contenido inmutable de una versión del índice local."""
+
+    def __init__(self, ids, metadata, vectors, centroids=None, offsets=None):
+        self.ids = ids
+        self.metadata = metadata
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = offsets
+        self._fields = {}
+
+    def field(self, name):
+        # Cada campo de metadata se factoriza una vez: filtrar es comparar enteros.
+        if name not in self._fields:
+            codes, uniques = pd.factorize(pd.Series([m.get(name) for m in self.metadata], dtype="object"))
+            self._fields[name] = (codes, {value: code for code, value in enumerate(uniques)})
+        return self._fields[name]
+
+    def mask(self, filter):
+        mask = np.ones(len(self.ids), dtype=bool)
+        for name, condition in filter.items():
+            codes, lookup = self.field(name)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, value in condition.items():
+                if operator == "$eq":
+                    wanted = [lookup[value]] if value in lookup else []
+                elif operator == "$in":
+                    wanted = [lookup[v] for v in value if v in lookup]
+                else:
+                    raise ValueError(f"Operador de filtro no soportado: {operator}")
+                mask &= np.isin(codes, wanted)
+        return mask
+
+
+class LocalVectorStore(VectorStore):
+    def __init__(self, path=None, ivf_min_vectors=None, nprobe=None):
+        self.path = Path(path or VECTOR_STORE_PATH)
+        self.ivf_min_vectors = ivf_min_vectors or IVF_MIN_VECTORS
+        self.nprobe = nprobe or IVF_NPROBE
+        self.lock = threading.RLock()
+        self.pending = {}
+        self.deleted = set()
+        self.snapshot = _Snapshot([], [], np.zeros((0, 0), dtype=np.float32))
+        self.version = None
+        self.manifest_mtime = None
+        self._refresh()
+
+    # --- escritura: se acumula en memoria y se persiste en flush() ---
+
+    def upsert(self, vectors):
+        with self.lock:
+            for vector in vectors:
+                self.pending[vector["id"]] = (_normalize(vector["values"]), vector.get("metadata") or {})
+                self.deleted.discard(vector["id"])
+
+    def delete(self, ids):
+        with self.lock:
+            for key in ids:
+                self.pending.pop(key, None)
+                self.deleted.add(key)
+
+    def list(self, prefix):
+        with self.lock:
+            ids = {key for key in self.snapshot.ids if key.startswith(prefix)} - self.deleted
+            ids.update(key for key in self.pending if key.startswith(prefix))
+        ids = sorted(ids)
+        for start in range(0, len(ids), LIST_PAGE_SIZE):
+            yield ids[start:start + LIST_PAGE_SIZE]
+
+    def flush(self):
+        with self.lock, self._write_lock():
+            if not self.pending and not self.deleted:
+                return
+            # Bajo el lock de escritura se parte de la última versión publicada,
+            # incluida la que haya escrito otro proceso.
+            self._refresh(force=True)
+            old = self.snapshot
+            keep = [pos for pos, key in enumerate(old.ids) if key not in self.pending and key not in self.deleted]
+            ids = [old.ids[pos] for pos in keep] + list(self.pending)
+            metadata = [old.metadata[pos] for pos in keep] + [meta for _, meta in self.pending.values()]
+            new_vectors = [values for values, _ in self.pending.values()]
+            parts = ([np.asarray(old.vectors[keep])] if keep else []) + ([np.vstack(new_vectors)] if new_vectors else [])
+            vectors = np.vstack(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+            self._write(ids, metadata, vectors, replaced=self.version)
+            self.pending.clear()
+            self.deleted.clear()
+            self._refresh(force=True)
+
+    @contextmanager
+    def _write_lock(self):
+        # Lock exclusivo entre procesos: una ingesta puede correr en cualquier worker.
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / "write.lock", "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _files(self, version):
+        return [self.path / f"{name}-{version}.{ext}" for name, ext in
+                (("vectors", "f32"), ("meta", "json"), ("centroids", "npy"), ("offsets", "npy"))]
+
+    def _write(self, ids, metadata, vectors, replaced=None):
+        version = f"{time.time_ns()}{uuid.uuid4().hex[:8]}"
+        vectors_path, meta_path, centroids_path, offsets_path = self._files(version)
+        manifest = {"version": version, "count": len(ids), "dim": int(vectors.shape[1]) if len(ids) else 0, "nlist": 0}
+
+        if len(ids) >= self.ivf_min_vectors:
+            # Los vectores se guardan ordenados por lista: cada lista es un bloque contiguo del memmap.
+            nlist = max(1, int(np.sqrt(len(ids))))
+            centroids = kmeans(vectors, nlist)
+            labels = _assign(vectors, centroids)
+            order = np.argsort(labels, kind="stable")
+            vectors = vectors[order]
+            ids = [ids[pos] for pos in order]
+            metadata = [metadata[pos] for pos in order]
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=nlist))]).astype(np.int64)
+            np.save(centroids_path, centroids)
+            np.save(offsets_path, offsets)
+            manifest["nlist"] = nlist
+
+        if len(ids):
+            mapped = np.memmap(vectors_path, dtype=np.float32, mode="w+", shape=vectors.shape)
+            mapped[:] = vectors
+            mapped.flush()
+            del mapped
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "metadata": metadata}, f, ensure_ascii=False)
+
+        # El manifest se reemplaza atómicamente: los lectores ven la versión vieja o la nueva.
+        tmp = self.path / f"manifest.json.{version}.tmp"
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, self.path / "manifest.json")
+        # Solo se borra la versión reemplazada: nunca archivos de otra escritura.
+        if replaced:
+            for old in self._files(replaced):
+                try:
+                    old.unlink(missing_ok=True)
+                except OSError:
+                    pass  # en Windows no se puede borrar un archivo mapeado por otro proceso
+
+    # --- lectura ---
+
+    def _refresh(self, force=False):
+        # Otro proceso (o una ingesta) puede haber escrito una versión nueva.
+        manifest_path = self.path / "manifest.json"
+        for attempt in range(REFRESH_RETRIES):
+            try:
+                mtime = manifest_path.stat().st_mtime_ns
+                if mtime == self.manifest_mtime and not force:
+                    return
+                manifest = json.loads(manifest_path.read_text())
+                if manifest["version"] == self.version:
+                    self.manifest_mtime = mtime
+                    return
+                snapshot = self._load(manifest)
+            except FileNotFoundError:
+                if not manifest_path.exists():
+                    return
+                # Se leyó el manifest justo antes de que otro proceso publicara una
+                # versión nueva y borrara la anterior: se vuelve a leer.
+                time.sleep(REFRESH_BACKOFF_SECONDS * (attempt + 1))
+                continue
+            with self.lock:
+                self.snapshot = snapshot
+                self.version = manifest["version"]
+                self.manifest_mtime = mtime
+            return
+        print(f"⚠️ El índice vectorial en {self.path} apunta a una versión incompleta; se sigue con la versión cargada.")
+
+    def _load(self, manifest):
+        version, count = manifest["version"], manifest["count"]
+        vectors_path, meta_path, centroids_path, offsets_path = self._files(version)
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if count:
+            vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(count, manifest["dim"]))
+        else:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+        centroids = offsets = None
+        if manifest["nlist"]:
+            centroids = np.load(centroids_path)
+            offsets = np.load(offsets_path)
+        return _Snapshot(meta["ids"], meta["metadata"], vectors, centroids, offsets)
+
+    def _candidates(self, snapshot, query, mask):
+        """Posiciones a puntuar; None significa todas."""
+        exact = snapshot.centroids is None
+        if mask is not None and mask.sum() <= self.ivf_min_vectors:
+            # Un filtro selectivo (club + temporada) deja pocos vectores: búsqueda exacta.
+            exact = True
+        if exact:
+            return np.flatnonzero(mask) if mask is not None else None
+        lists = np.argsort(snapshot.centroids @ query)[-self.nprobe:]
+        offsets = snapshot.offsets
+        positions = np.concatenate([np.arange(offsets[i], offsets[i + 1]) for i in lists])
+        if mask is not None:
+            positions = positions[mask[positions]]
+        return positions
+
+    def query(self, vector, top_k=10, filter=None, include_metadata=True, exact=False):
+        if self.pending or self.deleted:
+            self.flush()
+        self._refresh()
+        snapshot = self.snapshot
+        if not snapshot.ids:
+            return {"matches": []}
+
+        query = _normalize(vector)
+        mask = snapshot.mask(filter) if filter else None
+        positions = np.flatnonzero(mask) if exact and mask is not None else None
+        if not exact:
+            positions = self._candidates(snapshot, query, mask)
+            if positions is not None and len(positions) < top_k and mask is not None:
+                positions = np.flatnonzero(mask)
+
+        if positions is None:
+            scores = snapshot.vectors @ query
+        elif len(positions) > len(snapshot.ids) // 4:
+            # Con muchas posiciones conviene puntuar todo el bloque contiguo y después elegir.
+            scores = (snapshot.vectors @ query)[positions]
+        else:
+            scores = snapshot.vectors[positions] @ query
+        k = min(top_k, len(scores))
+        if k == 0:
+            return {"matches": []}
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+
+        matches = []
+        for pick in best:
+            pos = int(pick if positions is None else positions[pick])
+            match = {"id": snapshot.ids[pos], "score": float(scores[pick])}
+            if include_metadata:
+                match["metadata"] = snapshot.metadata[pos]
+            matches.append(match)
+        return {"matches": matches}
+
+
+def open_store(backend=None, api_key=None, index_name="winning"):
+    backend = backend or VECTOR_STORE
+    if backend == "local":
+        return LocalVectorStore()
+    if backend == "pinecone":
+        # Import diferido: el backend local funciona sin el cliente de Pinecone instalado.
+        from pinecone import Pinecone
+        return PineconeStore(Pinecone(api_key=api_key).Index(index_name))
+    raise ValueError(f"VECTOR_STORE desconocido: {backend}")